@@ -4,6 +4,8 @@ from .cell_picker import *
 from .landscape_stats import *
 from .patch_analysis import *
 from .make_distance_matrix import *
+from .grid_cache import *
+from .grid_store import *
 
 from .utils import *
 
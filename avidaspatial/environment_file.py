@@ -1,4 +1,5 @@
 import seaborn as sns
+import numpy as np
 import copy
 
 
@@ -6,13 +7,26 @@ class EnvironmentFile:
     """
     A class to hold data related to a single environment file.
     This is generally called by parse_environment_file()
+
+    Along with the grid of resource sets, an EnvironmentFile can describe
+    its resources as arrays:
+    - masks: an (n_resources, rows, cols) boolean array in which
+      masks[r][y][x] indicates whether resources[r] is present at (x, y)
+    - niche_ids: a (rows, cols) integer array indicating which niche
+      (i.e. set of resources) each cell is in
+    - niches: a list of frozensets of resources, indexed by niche id
+
+    Whichever of the grid and the masks wasn't provided is built the first
+    time it's needed. These describe the grid as it was when they were
+    built, so modifying the sets in the grid in place won't update them
+    (assigning a new grid will).
     """
 
-    def __init__(self, grid, resources, size, name, tasks):
+    def __init__(self, grid, resources, size, name, tasks, masks=None):
         """
         Arguments:
         - grid: a 2d array of sets of strings representing which resources
-          are present in which cells.
+          are present in which cells. Can be None if masks is given.
 
         - resources: a list of strings representing all of the resources
           found anywhere in the world
@@ -24,8 +38,14 @@ class EnvironmentFile:
         - tasks: a list of strings representing all of the tasks rewarded by
           the environment file (extracted from reactions), in order of
           appearance.
+
+        - masks: (optional) an (n_resources, rows, cols) boolean array
+          indicating where each resource is present.
         """
-        self.grid = grid
+        self._grid = grid
+        self._masks = masks
+        self._niche_ids = None
+        self._niches = None
         self.resources = list(resources)
         self.size = size
         self.name = name.split("/")[-1]  # Extract filename from path
@@ -72,12 +92,87 @@ class EnvironmentFile:
             self.task_palette = sns.color_palette("colorblind", len(tasks))
             self.resource_palette = sns.color_palette("bone", len(resources))
 
+    @property
+    def grid(self):
+        if self._grid is None:
+            niches = self.niches
+            self._grid = [[set(niches[niche]) for niche in row]
+                          for row in self.niche_ids.tolist()]
+        return self._grid
+
+    @grid.setter
+    def grid(self, grid):
+        self._grid = grid
+        self._masks = None
+        self._niche_ids = None
+        self._niches = None
+
+    @property
+    def masks(self):
+        if self._masks is None:
+            masks = np.zeros((len(self.resources), len(self._grid),
+                              len(self._grid[0])), dtype=bool)
+            for r, res in enumerate(self.resources):
+                masks[r] = [[res in cell for cell in row]
+                            for row in self._grid]
+            self._masks = masks
+        return self._masks
+
+    @property
+    def niche_ids(self):
+        if self._niche_ids is None:
+            self._find_niches()
+        return self._niche_ids
+
+    @property
+    def niches(self):
+        if self._niches is None:
+            self._find_niches()
+        return self._niches
+
+    def _find_niches(self):
+        """
+        Numbers each distinct combination of resources in the masks.
+        """
+        masks = self.masks
+        n_res, rows, cols = masks.shape
+        if n_res == 0:
+            self._niches = [frozenset()]
+            self._niche_ids = np.zeros((rows, cols), dtype=np.intp)
+            return
+
+        flat_masks = masks.reshape(n_res, -1)
+        if n_res < 64:
+            # Encode each cell's combination of resources as an integer,
+            # with the first resource as the most significant bit so that
+            # niches come out in the same order as below
+            codes = np.zeros(rows * cols, dtype=np.int64)
+            for r in range(n_res):
+                codes |= flat_masks[r].astype(np.int64) << (n_res - 1 - r)
+            codes, ids = np.unique(codes, return_inverse=True)
+            combos = (codes[:, np.newaxis] >>
+                      np.arange(n_res - 1, -1, -1)) & 1
+        else:
+            combos, ids = np.unique(flat_masks.T, axis=0,
+                                    return_inverse=True)
+
+        self._niches = [frozenset(self.resources[r]
+                                  for r in np.flatnonzero(combo))
+                        for combo in combos]
+        self._niche_ids = ids.reshape(rows, cols)
+
     def __getitem__(self, index):
         return self.grid[index]
 
     def __len__(self):
-        return len(self.grid)
+        if self._grid is None:
+            return self._masks.shape[1]
+        return len(self._grid)
 
     def __deepcopy__(self, memo):
-        return EnvironmentFile(copy.deepcopy(self.grid), self.resources,
+        if self._grid is None:
+            return EnvironmentFile(None, self.resources, self.size,
+                                   self.name, self.tasks,
+                                   masks=self._masks.copy())
+        return EnvironmentFile(copy.deepcopy(self._grid), self.resources,
                                self.size, self.name, self.tasks)
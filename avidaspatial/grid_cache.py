@@ -0,0 +1,121 @@
+# This file contains functions for caching parsed grid_task files on disk, so
+# that loading the same files again is just a memory-map of a binary array
+# rather than a re-parse of the text.
+
+import os
+import hashlib
+import numpy as np
+
+# By default, the cache is allowed to grow to 1 GB before the least recently
+# used entries are deleted.
+DEFAULT_CACHE_BYTES = 2 ** 30
+
+
+def cached_grid_path(filename, cache_dir, data_type="binary", delim=" "):
+    """
+    Returns the path that the parsed contents of filename would be cached
+    at. Entries are keyed on the absolute path, size, and modification time
+    of the file (plus the settings used to parse it), so editing or
+    replacing a file automatically invalidates its cache entry.
+    """
+    stats = os.stat(filename)
+    mtime = getattr(stats, "st_mtime_ns", stats.st_mtime)
+    key = repr((os.path.abspath(filename), stats.st_size, mtime,
+                data_type, delim))
+    return os.path.join(cache_dir,
+                        hashlib.sha1(key.encode("utf-8")).hexdigest() +
+                        ".npy")
+
+
+def load_cached_grid(filename, cache_dir, data_type="binary", delim=" "):
+    """
+    Returns a read-only memory-mapped array holding the cached contents of
+    filename, or None if it isn't in the cache.
+    """
+    path = cached_grid_path(filename, cache_dir, data_type, delim)
+    if not os.path.exists(path):
+        return None
+
+    try:
+        grid = np.load(path, mmap_mode="r")
+    except (IOError, OSError, ValueError):
+        # Entry was evicted or is being written by another process
+        return None
+
+    # Mark this entry as recently used
+    try:
+        os.utime(path, None)
+    except OSError:
+        pass
+
+    return grid
+
+
+def store_cached_grid(filename, grid, cache_dir, data_type="binary",
+                      delim=" ", max_bytes=DEFAULT_CACHE_BYTES):
+    """
+    Saves grid (the parsed contents of filename) to the cache, and then
+    evicts the least recently used entries until the cache is no bigger than
+    max_bytes. Eviction has to look at every entry in the cache, so when
+    storing many grids at once, pass None as max_bytes and call
+    evict_grid_cache once at the end. Returns the path of the new entry.
+    """
+    if not os.path.isdir(cache_dir):
+        try:
+            os.makedirs(cache_dir)
+        except OSError:  # Another process may have just created it
+            if not os.path.isdir(cache_dir):
+                raise
+
+    path = cached_grid_path(filename, cache_dir, data_type, delim)
+
+    # Write to a temporary file first so that no one ever reads a partial
+    # entry
+    tmp_path = path + "." + str(os.getpid()) + ".tmp"
+    with open(tmp_path, "wb") as outfile:
+        np.save(outfile, np.asarray(grid))
+    try:
+        os.rename(tmp_path, path)
+    except OSError:
+        os.remove(tmp_path)
+
+    if max_bytes is not None:
+        evict_grid_cache(cache_dir, max_bytes, keep=path)
+    return path
+
+
+def evict_grid_cache(cache_dir, max_bytes=DEFAULT_CACHE_BYTES, keep=None):
+    """
+    Deletes the least recently used entries in cache_dir until the total
+    size of the cache is no more than max_bytes. The entry at path keep (if
+    given) is never deleted.
+    """
+    entries = []
+    for name in os.listdir(cache_dir):
+        if not name.endswith(".npy"):
+            continue
+        path = os.path.join(cache_dir, name)
+        try:
+            stats = os.stat(path)
+        except OSError:
+            continue
+        entries.append((stats.st_mtime, stats.st_size, path))
+
+    total = sum(entry[1] for entry in entries)
+    for mtime, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+
+
+def clear_grid_cache(cache_dir):
+    """
+    Deletes every entry in cache_dir.
+    """
+    evict_grid_cache(cache_dir, 0)
@@ -0,0 +1,62 @@
+# This file contains functions for storing the grid_task files from a whole
+# experiment (many replicates, each with many time points) in a single
+# memory-mapped array, so that analyses can read just the slices they need
+# rather than re-parsing text. The store is a directory containing the array
+# (in .npy format, with the shape (replicates, times, rows, cols)) and a
+# JSON file describing it. It is built by build_grid_store and read by
+# load_grid_store (both in parse_files).
+
+import os
+import json
+import numpy as np
+
+GRID_STORE_ARRAY = "grids.npy"
+GRID_STORE_METADATA = "metadata.json"
+
+
+def create_grid_store(store_dir, shape, dtype, metadata):
+    """
+    Creates a new store in store_dir, holding an array of the given shape
+    and dtype (initially all zeros) described by the metadata dictionary.
+
+    Returns a writable memory-mapped array.
+    """
+    if not os.path.isdir(store_dir):
+        os.makedirs(store_dir)
+
+    grids = np.lib.format.open_memmap(
+        os.path.join(store_dir, GRID_STORE_ARRAY), mode="w+", dtype=dtype,
+        shape=tuple(shape))
+    write_grid_store_metadata(store_dir, metadata)
+    return grids
+
+
+def write_grid_store_metadata(store_dir, metadata):
+    """
+    Saves the metadata dictionary describing the store in store_dir.
+    """
+    with open(os.path.join(store_dir, GRID_STORE_METADATA), "w") as outfile:
+        json.dump(metadata, outfile, indent=1, sort_keys=True)
+
+
+def grid_store_metadata(store_dir):
+    """
+    Returns the dictionary describing the store in store_dir, containing:
+    - replicates: the name of each replicate (its directory, relative to the
+      directory the store was built from)
+    - times: the time point (update) of each snapshot
+    - world_size: the x and y dimensions of the world
+    - data_type: the data_type the files were parsed as
+    - missing: [replicate, time] index pairs with no grid_task file, which
+      are filled with -1 (or NaN for floats)
+    """
+    with open(os.path.join(store_dir, GRID_STORE_METADATA)) as infile:
+        return json.load(infile)
+
+
+def open_grid_store(store_dir):
+    """
+    Returns the array in the store in store_dir as a read-only memory map,
+    so that only the parts of it that are used get read from disk.
+    """
+    return np.load(os.path.join(store_dir, GRID_STORE_ARRAY), mmap_mode="r")
@@ -3,17 +3,13 @@ from .parse_files import *
 
 
 def patch_richness(world, world_size=(60,60)):
-    niches = {}
-    for i in range(world_size[1]):
-        for j in range(world_size[0]):
-
-            # use frozensets because they are hashable
-            if frozenset(world[i][j]) in niches:
-                niches[frozenset(world[i][j])] += 1
-            else:
-                niches[frozenset(world[i][j])] = 1
-
-    return len(niches.keys())
+    """
+    Returns the number of distinct niches (sets of resources) in the part of
+    world covered by world_size. world can be a grid of sets of resources,
+    an EnvironmentFile, or an EnvironmentSummary.
+    """
+    ids = _niche_raster(world, world_size)[0]
+    return len(np.unique(ids))
 
 
 def calc_environment_entropy(world, world_size=(60, 60),
@@ -45,33 +41,68 @@ def calc_environment_entropy(world, world_size=(60, 60),
 
 
 def make_niche_dictionary(world, world_size, mode="freq"):
-    # loop through world, counting frequency of each niche
+    """
+    Returns a dictionary mapping each niche (a frozenset of resources) in
+    the part of world covered by world_size to the number of cells it covers
+    (if mode is "freq") or a list of the [row, column] locations of those
+    cells (if mode is "cells"). Niches are in the order they first appear
+    in, reading the world row by row.
+
+    world can be a grid of sets of resources, an EnvironmentFile, or an
+    EnvironmentSummary. The last two already number their niches, so the
+    cells are counted without building a set for each one.
+    """
+    if mode not in ["freq", "cells"]:
+        print("Unrecognized mode for make_niche_dictionary")
+        return
+
+    ids, niche_list = _niche_raster(world, world_size)
+    present, first, counts = np.unique(ids, return_index=True,
+                                       return_counts=True)
+    order = np.argsort(first)
+
     niches = {}
-    for i in range(world_size[1]):
-        for j in range(world_size[0]):
-            # use frozensets because they are hashable
-            if frozenset(world[i][j]) in niches:
-                if mode == "freq":
-                    niches[frozenset(world[i][j])] += 1
-                elif mode == "cells":
-                    niches[frozenset(world[i][j])].append([i, j])
-            else:
-                if mode == "freq":
-                    niches[frozenset(world[i][j])] = 1
-                elif mode == "cells":
-                    niches[frozenset(world[i][j])] = [[i, j]]
-                else:
-                    print("Unrecognized mode for make_niche_dictionary")
-                    return
+    for k in order:
+        if mode == "freq":
+            niches[niche_list[present[k]]] = int(counts[k])
+        else:
+            niches[niche_list[present[k]]] = \
+                np.argwhere(ids == present[k]).tolist()
 
     return niches
 
 
+def _niche_raster(world, world_size):
+    """
+    Returns a (rows, cols) array numbering the niche at each location in the
+    part of world covered by world_size, and a list of the niches (frozensets
+    of resources) that the numbers refer to.
+    """
+    if not hasattr(world, "niche_ids"):
+        lookup = {}
+        ids = np.empty((world_size[1], world_size[0]), dtype=np.intp)
+        for i in range(world_size[1]):
+            for j in range(world_size[0]):
+                # use frozensets because they are hashable
+                ids[i, j] = lookup.setdefault(frozenset(world[i][j]),
+                                              len(lookup))
+        return ids, sorted(lookup, key=lookup.get)
+
+    ids = world.niche_ids
+    if ids.shape[0] < world_size[1] or ids.shape[1] < world_size[0]:
+        raise IndexError("world_size is bigger than the world")
+    return ids[:world_size[1], :world_size[0]], world.niches
+
+
 def entropy(dictionary):
     """
     Helper function for entropy calculations.
     Takes a frequency dictionary and calculates entropy of the keys.
+    Arrays of counts are handed to entropy_array.
     """
+    if not isinstance(dictionary, dict):
+        return entropy_array(dictionary)
+
     total = 0.0
     entropy = 0
     for key in dictionary.keys():
@@ -82,23 +113,54 @@ def entropy(dictionary):
     return entropy
 
 
+def entropy_array(counts, index="shannon"):
+    """
+    Vectorized diversity calculations. Takes an array of counts (or
+    frequencies) of each category and calculates a diversity index over the
+    last axis. A 1d array gives a single number, while a 2d array with a
+    row of counts for each cell gives an array with a number for each cell
+    (and so on for more dimensions).
+
+    index - which diversity index to calculate:
+      "shannon" - Shannon entropy in bits, as calculated by entropy()
+      "sqrt_shannon" - Shannon entropy of the square roots of the counts, as
+                       calculated by sqrt_shannon_entropy()
+      "simpson" - Simpson's index: the sum of the squared proportions of
+                  each category (i.e. the probability that two individuals
+                  picked at random are in the same category)
+
+    Categories with a count of 0 are ignored, and sets of counts that are
+    all 0 have an index of 0.
+    """
+    counts = np.asarray(counts, dtype=float)
+    if index == "sqrt_shannon":
+        counts = np.sqrt(counts)
+    elif index not in ["shannon", "simpson"]:
+        raise ValueError("Unknown diversity index: " + str(index))
+
+    totals = counts.sum(axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        p = counts / totals[..., np.newaxis]
+        if index == "simpson":
+            result = (p * p).sum(axis=-1)
+        else:
+            result = np.where(p > 0, p * (np.log(1.0 / p) / log(2)),
+                              0).sum(axis=-1)
+
+    result = np.where(totals > 0, result, 0.0)
+    if result.ndim == 0:
+        return float(result)
+    return result
+
+
 def sqrt_shannon_entropy(filename):
     """
     Calculates Shannon entropy based on square root of phenotype count.
     This might account for relationship between population size and
     evolvability.
     """
-    data = load_grid_data(filename, "int")
+    data = load_grid_data(filename, "int", as_array=True)
     data = agg_grid(data, mode)
-    phenotypes = {}
-    for r in data:
-        for c in r:
-            if c in phenotypes:
-                phenotypes[c] += 1
-            else:
-                phenotypes[c] = 1
-
-    for key in phenotypes.keys():
-        phenotypes[key] = sqrt(phenotypes[key])
-
-    return entropy(phenotypes)
+    counts = np.unique(data, return_counts=True)[1]
+
+    return entropy_array(counts, "sqrt_shannon")
@@ -2,13 +2,47 @@
 # This file contains functions for parsing Avida environment files and spatial
 # data output files.
 
+import os
 import re
+import fnmatch
+from collections import namedtuple
+from functools import partial
+import numpy as np
 from .utils import *
+from .utils import _dimensions_from_lines
 from copy import deepcopy
 from .environment_file import EnvironmentFile
-
-
-def load_grid_data(file_list, data_type="binary", sort=True, delim=" "):
+from .grid_cache import *
+from .grid_store import *
+
+# Numpy dtypes used to store each data_type when grids are loaded as arrays.
+# Phenotypes are packed into the smallest signed type that can hold them
+# (see phenotype_dtype), so this is only the widest type they can have.
+GRID_DTYPES = {"binary": np.int64, "int": np.int64, "float": np.float64,
+               "string": object}
+
+# Functions converting a single value in a grid file to each data_type when
+# grids are loaded as nested lists.
+GRID_CONVERTERS = {"binary": lambda val: bin(int(val)), "int": int,
+                   "float": float, "string": str}
+
+# Summary of a parsed environment file, as returned by
+# parse_environment_batch. niche_ids is a (rows, cols) array of indices into
+# niches, a list of frozensets of resources.
+EnvironmentSummary = namedtuple("EnvironmentSummary",
+                                ["niche_ids", "niches", "resources", "tasks"])
+
+# Parsed GRADIENT_RESOURCE and CELL lines, keyed on the text of the line
+# and the settings it was parsed with. Environment files from the same
+# sweep tend to share most of their resource specs, so each distinct one is
+# only rasterized once per process.
+_RESOURCE_SPECS = {}
+_MAX_RESOURCE_SPECS = 4096
+
+
+def load_grid_data(file_list, data_type="binary", sort=True, delim=" ",
+                   as_array=False, workers=None, cache_dir=None,
+                   max_cache_bytes=DEFAULT_CACHE_BYTES, world_size=None):
     """
     Loads data from one or multiple grid_task files.
 
@@ -25,6 +59,33 @@ def load_grid_data(file_list, data_type="binary", sort=True, delim=" "):
                     If for some reason you don't want them in chronological
                     order, set sort to False.
 
+        as_array  - If True, return a numpy array with the shape (rows,
+                    columns, number of files) instead of nested lists, which
+                    is much faster and smaller for big worlds or long runs.
+                    Phenotypes ("binary") are stored as integers whose bits
+                    indicate the tasks performed, rather than as "0b..."
+                    strings, so pass agg_grid an explicit aggregation
+                    (e.g. string_avg rather than mode). Default: False.
+
+        workers   - The number of processes to use to parse files
+                    concurrently. Results are always returned in the same
+                    order as file_list. Default (None): parse files one at a
+                    time in this process.
+
+        cache_dir - A directory in which to cache the parsed contents of
+                    each file as a binary array. Files that are already in
+                    the cache (and haven't changed since they were cached)
+                    are memory-mapped rather than parsed again. Default
+                    (None): don't cache. Only numeric data types are cached.
+
+        max_cache_bytes - The maximum size of the cache. Once it is
+                    exceeded, the least recently used entries are deleted.
+                    Default: DEFAULT_CACHE_BYTES (1 GB).
+
+        world_size - A tuple with the x and y dimensions of the world, if
+                    they are already known. By default, the dimensions are
+                    worked out from the first file while it is being read.
+
     Returns: A three-dimensional array. The first dimension is columns, the
     second is rows. At each row,column index in the array is another list
     which holds the values that each of the requested files has at that
@@ -32,6 +93,95 @@ def load_grid_data(file_list, data_type="binary", sort=True, delim=" "):
     representative number, you should use agg_niche_grid.
     """
 
+    file_list = _prepare_file_list(file_list, sort)
+
+    if data_type not in GRID_CONVERTERS:
+        print("Unsupported data_type passed to load_grid")
+        return
+
+    # The cache is trimmed once all of the files are loaded, rather than
+    # after storing each one
+    cache = {"cache_dir": cache_dir, "max_cache_bytes": None}
+
+    if as_array:
+        data = _load_grid_array(file_list, data_type, delim, workers, cache,
+                                world_size)
+        _trim_grid_cache(cache_dir, data_type, max_cache_bytes)
+        return data
+
+    # Loop through file list, reading in data
+    data = None
+    read_file = partial(_read_grid_lists, world_size=world_size,
+                        data_type=data_type, delim=delim, **cache)
+    for grid in map_in_pool(read_file, file_list, workers):
+        if data is None:
+            # Unless we were told otherwise, the first file determines the
+            # size of the world
+            world_size = (len(grid[0]), len(grid))
+
+            # Initialize empty data array
+            data = initialize_grid(world_size, [])
+
+        for i in range(world_size[1]):
+            for j in range(world_size[0]):
+                data[i][j].append(grid[i][j])
+
+    _trim_grid_cache(cache_dir, data_type, max_cache_bytes)
+    return data
+
+
+def iter_grid_data(file_list, data_type="binary", sort=True, delim=" ",
+                   as_array=False, cache_dir=None,
+                   max_cache_bytes=DEFAULT_CACHE_BYTES, world_size=None):
+    """
+    Generator version of load_grid_data. Rather than building the whole
+    three-dimensional history in memory, yields the grid stored in each file
+    one at a time (in chronological order, unless sort is False). This lets
+    runs with many thousands of updates be processed in bounded memory, e.g.
+    with the stream_* aggregation functions.
+
+    Arguments are the same as for load_grid_data.
+
+    Yields: a 2d list of the values in each file (or a 2d numpy array, if
+    as_array is True).
+    """
+    file_list = _prepare_file_list(file_list, sort)
+
+    if data_type not in GRID_CONVERTERS:
+        print("Unsupported data_type passed to load_grid")
+        return
+
+    try:
+        for f in file_list:
+            if as_array:
+                grid = parse_grid_file(f, data_type, delim, cache_dir, None,
+                                       world_size)
+            else:
+                grid = _read_grid_lists(f, world_size, data_type, delim,
+                                        cache_dir, None)
+                if world_size is None:
+                    world_size = (len(grid[0]), len(grid))
+            yield grid
+    finally:
+        _trim_grid_cache(cache_dir, data_type, max_cache_bytes)
+
+
+def _trim_grid_cache(cache_dir, data_type, max_cache_bytes):
+    """
+    Evicts the least recently used entries from the cache in cache_dir (if
+    one was used to load files of data_type) until it is no bigger than
+    max_cache_bytes.
+    """
+    if cache_dir is not None and data_type != "string" and \
+            os.path.isdir(cache_dir):
+        evict_grid_cache(cache_dir, max_cache_bytes)
+
+
+def _prepare_file_list(file_list, sort):
+    """
+    Makes sure file_list is a list and, if sort is True, puts it in
+    chronological order (based on the numbers in the file names).
+    """
     # If there's only one file, we pretend it's a list
     if not type(file_list) is list:
         file_list = [file_list]
@@ -39,37 +189,304 @@ def load_grid_data(file_list, data_type="binary", sort=True, delim=" "):
         # put file_list in chronological order
         file_list.sort(key=lambda f: int(re.sub("[^0-9]", "", f)))
 
-    world_size = get_world_dimensions(file_list[0], delim)
+    return file_list
 
-    # Initialize empty data array
-    data = initialize_grid(world_size, [])
 
-    # Loop through file list, reading in data
-    for f in file_list:
-        infile = open(f)
-        lines = infile.readlines()
-        for i in range(world_size[1]):
-            lines[i] = lines[i].strip().split(delim)
+def _read_grid_lists(filename, world_size, data_type, delim, cache_dir=None,
+                     max_cache_bytes=DEFAULT_CACHE_BYTES):
+    """
+    Reads the values in a single grid_task file into a 2d list, converting
+    them with the appropriate function from GRID_CONVERTERS. If world_size
+    is None, it is worked out from the lines of the file.
+    """
+    convert = GRID_CONVERTERS[data_type]
 
-            for j in range(world_size[0]):
-                if data_type == "binary":
-                    val = bin(int(lines[i][j]))
-                elif data_type == "float":
-                    val = float(lines[i][j])
-                elif data_type == "int":
-                    val = int(lines[i][j])
-                elif data_type == "string":
-                    val = str(lines[i][j])
-                else:
-                    print("Unsupported data_type passed to load_grid")
-                    return
-                data[i][j].append(val)
-
-        infile.close()
+    if cache_dir is not None and data_type != "string":
+        grid = parse_grid_file(filename, data_type, delim, cache_dir,
+                               max_cache_bytes)
+        if world_size is None:
+            world_size = (grid.shape[1], grid.shape[0])
+        return [[convert(val) for val in row[:world_size[0]]]
+                for row in grid[:world_size[1]].tolist()]
+
+    infile = open(filename)
+    lines = infile.readlines()
+    infile.close()
+
+    if world_size is None:
+        world_size = _dimensions_from_lines(lines, delim)
+
+    grid = []
+    for i in range(world_size[1]):
+        line = lines[i].strip().split(delim)
+        grid.append([convert(line[j]) for j in range(world_size[0])])
+
+    return grid
+
+
+def parse_grid_file(filename, data_type="binary", delim=" ", cache_dir=None,
+                    max_cache_bytes=DEFAULT_CACHE_BYTES, world_size=None):
+    """
+    Reads a single grid_task file into a 2d numpy array (rows by columns).
+
+    Arguments:
+        filename  - the path to a file in grid_task.dat format.
+        data_type - "binary", "int", "float", or "string". Phenotypes
+                    ("binary") are returned as integers.
+        delim     - the string separating values on each line.
+        cache_dir - optional directory to cache the parsed array in (see
+                    load_grid_data). Cached arrays are returned as read-only
+                    memory maps.
+        max_cache_bytes - the maximum size of the cache in cache_dir, or
+                    None to leave trimming the cache to the caller (as
+                    load_grid_data does, once all of its files are loaded).
+        world_size - optional tuple with the expected x and y dimensions of
+                    the world. A ValueError is raised if the file doesn't
+                    match them.
+
+    Returns: a 2d numpy array with the dtype given in GRID_DTYPES (or, for
+    phenotypes, the smallest integer type that can hold them).
+    """
+    use_cache = cache_dir is not None and data_type != "string"
+    if use_cache:
+        grid = load_cached_grid(filename, cache_dir, data_type, delim)
+        if grid is not None:
+            return _check_grid_shape(grid, world_size, filename)
+
+    with open(filename) as infile:
+        text = infile.read()
+
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    tokens = [val for line in lines for val in line.split(delim)]
+    n_cols = len(lines[0].split(delim)) if lines else 0
+
+    if data_type == "string":
+        dtype = object
+    else:
+        dtype = np.float64 if data_type == "float" else np.int64
+    # Raises a ValueError on values that aren't of the requested type
+    values = np.array(tokens, dtype=dtype)
+
+    if values.size == 0 or values.size != len(lines) * n_cols:
+        raise ValueError("Could not read a rectangular grid from " + filename)
+
+    grid = _check_grid_shape(values.reshape(values.size // n_cols, n_cols),
+                             world_size, filename)
+
+    if data_type == "binary":
+        grid = grid.astype(phenotype_dtype(grid))
+
+    if use_cache:
+        store_cached_grid(filename, grid, cache_dir, data_type, delim,
+                          max_cache_bytes)
+
+    return grid
+
+
+def _check_grid_shape(grid, world_size, filename):
+    """
+    Raises a ValueError if world_size is given and the 2d array grid (read
+    from filename) doesn't have those dimensions. Otherwise returns grid.
+    """
+    if world_size is not None and \
+            grid.shape != (world_size[1], world_size[0]):
+        raise ValueError(filename + " does not match the world size " +
+                         str(tuple(world_size)))
+    return grid
+
+
+def _load_grid_array(file_list, data_type, delim, workers=None, cache=None,
+                     world_size=None):
+    """
+    Stacks the grids stored in each file in file_list into a single array
+    with the shape (rows, columns, number of files). cache holds the
+    cache_dir and max_cache_bytes arguments for parse_grid_file.
+    """
+    data = None
+    read_file = partial(parse_grid_file, data_type=data_type, delim=delim,
+                        world_size=world_size, **(cache or {}))
+
+    for k, grid in enumerate(map_in_pool(read_file, file_list, workers)):
+        f = file_list[k]
+
+        if data is None:
+            data = np.empty(grid.shape + (len(file_list),), dtype=grid.dtype)
+        elif grid.shape != data.shape[:2]:
+            raise ValueError(f + " does not have the same dimensions as " +
+                             file_list[0])
+        elif not np.can_cast(grid.dtype, data.dtype):
+            # Phenotypes with too many tasks for the default dtype
+            data = data.astype(np.promote_types(grid.dtype, data.dtype))
+
+        data[:, :, k] = grid
 
     return data
 
 
+def build_grid_store(root_dir, store_dir, data_type="binary",
+                     pattern="grid_task.*.dat", delim=" ", dtype=None,
+                     workers=None):
+    """
+    Packs the grid_task files from a whole experiment into a single
+    memory-mapped store (see grid_store.py), so that later analyses can
+    read any replicate or time point without re-parsing text.
+
+    Every directory under root_dir that contains files matching pattern is
+    treated as one replicate, and the number in each file's name as its
+    time point. If some replicates are missing some time points, those
+    slots are filled with -1 (NaN for floats) and listed in the metadata.
+
+    Arguments:
+        root_dir  - the directory containing the replicates.
+        store_dir - the directory to create the store in.
+        data_type - "binary", "int", or "float" (see load_grid_data).
+        pattern   - a glob pattern matching the names of the files to store.
+        delim     - the string separating values on each line.
+        dtype     - the numpy dtype to store values as. By default,
+                    phenotypes are stored as 32 bit integers, other integers
+                    as 64 bit integers and floats as 64 bit floats. A
+                    ValueError is raised if a value doesn't fit.
+        workers   - optional number of processes to parse files with.
+
+    Returns: the dictionary of metadata saved with the store (see
+    grid_store_metadata).
+    """
+    if data_type not in GRID_DTYPES or data_type == "string":
+        raise ValueError("Unsupported data_type for a grid store: " +
+                         str(data_type))
+    if dtype is None:
+        dtype = {"binary": np.int32, "int": np.int64,
+                 "float": np.float64}[data_type]
+    dtype = np.dtype(dtype)
+
+    replicates = _find_replicates(root_dir, pattern)
+    if len(replicates) == 0:
+        raise ValueError("No files matching " + pattern + " in " + root_dir)
+
+    names = sorted(replicates)
+    times = sorted(set(t for files in replicates.values() for t in files))
+    time_index = dict((t, i) for i, t in enumerate(times))
+
+    file_list = []
+    slots = []
+    for r, name in enumerate(names):
+        for t in sorted(replicates[name]):
+            file_list.append(replicates[name][t])
+            slots.append((r, time_index[t]))
+
+    missing = sorted(set((r, i) for r in range(len(names))
+                         for i in range(len(times))) - set(slots))
+
+    read_file = partial(parse_grid_file, data_type=data_type, delim=delim)
+    grids = None
+    for f, (r, i), grid in zip(file_list, slots,
+                               map_in_pool(read_file, file_list, workers)):
+        if grids is None:
+            world_size = (grid.shape[1], grid.shape[0])
+            metadata = {"replicates": names, "times": times,
+                        "world_size": list(world_size),
+                        "data_type": data_type,
+                        "missing": [list(slot) for slot in missing]}
+            grids = create_grid_store(store_dir, (len(names), len(times)) +
+                                      grid.shape, dtype, metadata)
+
+        _check_grid_shape(grid, world_size, f)
+        if dtype.kind in "iu" and grid.size and \
+                (grid.min() < np.iinfo(dtype).min or
+                 grid.max() > np.iinfo(dtype).max):
+            raise ValueError("Values in " + f + " don't fit in " +
+                             str(dtype) + "; pass a wider dtype")
+        grids[r, i] = grid
+
+    fill = np.nan if dtype.kind == "f" else -1
+    for r, i in missing:
+        grids[r, i] = fill
+
+    grids.flush()
+    return metadata
+
+
+def _find_replicates(root_dir, pattern):
+    """
+    Returns a dictionary mapping the path (relative to root_dir) of each
+    directory containing files that match pattern to a dictionary mapping
+    time points to the paths of those files.
+    """
+    replicates = {}
+    for dirpath, dirnames, filenames in os.walk(root_dir):
+        dirnames.sort()
+        files = {}
+        for filename in fnmatch.filter(filenames, pattern):
+            time = int(re.sub("[^0-9]", "", filename))
+            if time in files:
+                raise ValueError("More than one file for time " + str(time) +
+                                 " in " + dirpath)
+            files[time] = os.path.join(dirpath, filename)
+
+        if files:
+            name = os.path.relpath(dirpath, root_dir).replace(os.sep, "/")
+            replicates[name] = files
+
+    return replicates
+
+
+def load_grid_store(store_dir, replicates=None, times=None, time_last=False):
+    """
+    Reads part of a store made by build_grid_store. Only the selected
+    replicates and time points are read from disk.
+
+    Arguments:
+        store_dir  - the directory containing the store.
+        replicates - a replicate name (or index), a list of them, or None
+                     for all of them.
+        times      - a time point (the number in the file name), a list of
+                     them, or None for all of them.
+        time_last  - if True, the time axis is moved to the end, so that a
+                     single replicate has the shape (rows, cols, times) used
+                     by load_grid_data(..., as_array=True).
+
+    Returns: a numpy array with the shape (replicates, times, rows, cols),
+    minus the replicate or time axis if a single one was selected. Whole
+    axes are read-only memory-mapped views of the store; lists of
+    replicates or times are copied into memory.
+    """
+    metadata = grid_store_metadata(store_dir)
+    data = open_grid_store(store_dir)
+
+    r = _store_index(replicates, metadata["replicates"], "replicate")
+    t = _store_index(times, metadata["times"], "time")
+
+    data = data[r]
+    time_axis = 0 if isinstance(r, int) else 1
+    data = data[(slice(None),) * time_axis + (t,)]
+
+    if time_last and not isinstance(t, int):
+        data = np.moveaxis(data, time_axis, -1)
+    return data
+
+
+def _store_index(selection, labels, kind):
+    """
+    Converts a selection of replicates or times (see load_grid_store) to an
+    index into the corresponding axis of a grid store, given the labels of
+    that axis.
+    """
+    if selection is None:
+        return slice(None)
+
+    def find(label):
+        if label in labels:
+            return labels.index(label)
+        if kind == "replicate" and isinstance(label, (int, np.integer)) and \
+                0 <= label < len(labels):
+            return int(label)
+        raise ValueError("No " + kind + " " + str(label) + " in grid store")
+
+    if isinstance(selection, (list, tuple, np.ndarray)):
+        return [find(label) for label in selection]
+    return find(selection)
+
+
 def make_niche_grid(res_dict, world_size=(60, 60)):
     """
     Converts dictionary specifying where resources are to nested lists
@@ -96,7 +513,56 @@ def make_niche_grid(res_dict, world_size=(60, 60)):
     return world
 
 
-def parse_environment_file_list(names, world_size=(60, 60)):
+def make_niche_masks(res_dict, res_order, world_size=(60, 60),
+                     range_dict=None):
+    """
+    Converts dictionary specifying where resources are to an array of
+    boolean masks specifying where each resource is.
+
+    res_dict - a dictionary in which keys are resources in the environment
+    and values are list of tuples (or n x 2 arrays) representing the cells
+    they're in.
+
+    res_order - a list of the resources in res_dict (and range_dict), in the
+    order that the masks should be stacked in.
+
+    world_size - a tuple indicating the dimensions of the world.
+           Default = 60x60, because that's the default Avida world size
+
+    range_dict - (optional) a dictionary in which keys are resources and
+    values are lists of (start, stop) ranges of cell ids (as returned by
+    parse_cell_ranges) that they're in. Each range is filled in with a
+    single slice assignment.
+
+    Returns an (n_resources, rows, cols) boolean numpy array in which
+    masks[r][y][x] is True if res_order[r] is available at x,y.
+    """
+    masks = np.zeros((len(res_order), world_size[1], world_size[0]),
+                     dtype=bool)
+    n_cells = world_size[0] * world_size[1]
+
+    for r, res in enumerate(res_order):
+        cells = res_dict.get(res, [])
+        if len(cells) > 0:
+            cells = np.asarray(cells)
+            masks[r, cells[:, 1], cells[:, 0]] = True
+
+        if range_dict is None:
+            continue
+
+        # Cell ids count across rows, so they index the flattened mask
+        flat_mask = masks[r].reshape(n_cells)
+        for start, stop in range_dict.get(res, []):
+            if start < 0 or stop > n_cells:
+                raise ValueError("Cells " + str(start) + ".." +
+                                 str(stop - 1) + " of resource " + res +
+                                 " are outside the world")
+            flat_mask[start:stop] = True
+
+    return masks
+
+
+def parse_environment_file_list(names, world_size=(60, 60), toroidal=False):
     """
     Extract information about spatial resources from all environment files in
     a list.
@@ -105,6 +571,8 @@ def parse_environment_file_list(names, world_size=(60, 60)):
     names - a list of strings representing the paths to the environment files.
     world_size - a tuple representing the x and y coordinates of the world.
                  (default: 60x60)
+    toroidal - whether gradient resources wrap around the edges of the world
+               (default: False)
 
     Returns a dictionary in which the keys are filenames and the values are
     list of lists of sets indicating the set of resources
@@ -119,11 +587,73 @@ def parse_environment_file_list(names, world_size=(60, 60)):
 
     envs = []
     for name in names:
-        envs.append(parse_environment_file(name, world_size))
+        envs.append(parse_environment_file(name, world_size, toroidal))
 
     return envs
 
 
+def parse_environment_batch(names, world_size=(60, 60), toroidal=False,
+                            workers=None):
+    """
+    Parses many environment files at once, for sweeps with too many of them
+    to keep a full EnvironmentFile for each.
+
+    Arguments:
+    names - a list of strings representing the paths to the environment files.
+    world_size - a tuple representing the x and y coordinates of the world.
+                 (default: 60x60)
+    toroidal - whether gradient resources wrap around the edges of the world
+               (default: False)
+    workers - (optional) the number of processes to parse files with. By
+              default, files are parsed in this process.
+
+    Returns a dictionary in which the keys are filenames and the values are
+    EnvironmentSummary tuples of (niche_ids, niches, resources, tasks), where
+    niche_ids is a (rows, cols) array of indices into niches (a list of
+    frozensets of resources), stored in the smallest unsigned integer type
+    that fits.
+    """
+    names = _prepare_file_list(names, sort=False)
+
+    summarize = partial(_summarize_environment, world_size=world_size,
+                        toroidal=toroidal)
+    return dict(zip(names, map_in_pool(summarize, names, workers)))
+
+
+def _summarize_environment(filename, world_size, toroidal):
+    """
+    Parses an environment file and returns its EnvironmentSummary.
+    """
+    env = parse_environment_file(filename, world_size, toroidal)
+    niche_ids = env.niche_ids.astype(np.min_scalar_type(len(env.niches)))
+    return EnvironmentSummary(niche_ids, env.niches, env.resources,
+                              env.tasks)
+
+
+def _parse_resource_line(line, world_size, toroidal):
+    """
+    Parses a GRADIENT_RESOURCE line into (name, cells), where cells is an
+    n x 2 array of x, y coordinates, or a CELL line into (name, ranges),
+    remembering the result in case the same line turns up again (in this
+    file or another one). The results are shared with the cache and must not
+    be modified.
+    """
+    key = (line.strip(), tuple(world_size), toroidal)
+    if key in _RESOURCE_SPECS:
+        return _RESOURCE_SPECS[key]
+
+    if line.startswith("GRADIENT_RESOURCE"):
+        name, cells = parse_gradient(line, world_size, toroidal)
+        result = (name, np.array(cells, dtype=np.intp).reshape(-1, 2))
+    else:
+        result = parse_cell_ranges(line)
+
+    if len(_RESOURCE_SPECS) >= _MAX_RESOURCE_SPECS:
+        _RESOURCE_SPECS.clear()
+    _RESOURCE_SPECS[key] = result
+    return result
+
+
 def reduce_resource_name_to_task(res_name):
     """
     Assuming that the convention of naming resources associated with tasks as
@@ -140,7 +670,7 @@ def reduce_resource_name_to_task(res_name):
     return res_name
 
 
-def parse_environment_file(filename, world_size=(60, 60)):
+def parse_environment_file(filename, world_size=(60, 60), toroidal=False):
     """
     Extract information about spatial resources from an environment file.
 
@@ -148,6 +678,8 @@ def parse_environment_file(filename, world_size=(60, 60)):
     filename - a string representing the path to the environment file.
     world_size - a tuple representing the x and y coordinates of the world.
                  (default: 60x60)
+    toroidal - whether gradient resources wrap around the edges of the world
+               (default: False)
 
     Returns a list of lists of sets indicating the set of resources
     available at each x,y location in the Avida grid.
@@ -159,29 +691,37 @@ def parse_environment_file(filename, world_size=(60, 60)):
 
     tasks = []
 
-    # Find all spatial resources and record which cells they're in
+    # Find all spatial resources and record which cells they're in. CELL
+    # resources are kept as ranges of cell ids rather than lists of cells.
     res_order = []
     res_dict = {}
+    range_dict = {}
     for line in lines:
         if line.startswith("GRADIENT_RESOURCE"):
-            name, cells = parse_gradient(line, world_size)
+            name, cells = _parse_resource_line(line, world_size, toroidal)
+            dict_increment(res_dict, name, [cells])
         elif line.startswith("CELL"):
-            name, cells = parse_cell(line, world_size)
+            name, ranges = _parse_resource_line(line, world_size, toroidal)
+            dict_increment(range_dict, name, list(ranges))
         elif line.startswith("REACTION"):
             task = parse_reaction(line)
             if task not in tasks:
                 tasks.append(task)
+            continue
         else:
             continue
 
-        dict_increment(res_dict, name, cells)
         if name not in res_order:
             res_order.append(name)
 
-    # Create a map of niches across the environment and return it
-    grid = make_niche_grid(res_dict, world_size)
+    # Create a map of niches across the environment and return it. The
+    # grid of resource sets is only built if something asks for it.
+    for name in res_dict:
+        res_dict[name] = np.concatenate(res_dict[name])
+    masks = make_niche_masks(res_dict, res_order, world_size, range_dict)
 
-    return EnvironmentFile(grid, res_order, world_size, filename, tasks)
+    return EnvironmentFile(None, res_order, world_size, filename, tasks,
+                           masks=masks)
 
 
 def parse_reaction(line):
@@ -193,12 +733,16 @@ def parse_reaction(line):
     return sline[2].strip()
 
 
-def parse_gradient(line, world_size):
+def parse_gradient(line, world_size, toroidal=False):
     """
     Takes a string representing a GRADIENT_RESOURCE (as specified in Avida
     environment files) and a tuple representing the x and y dimensions of the
     world, and returns the name of the gradient resource and a list of
-    tuples representing the cells it's in.
+    tuples representing the cells it's in (ordered by x, then y).
+
+    A cell is in the resource if it is within height-1 of the peak. If
+    toroidal is True, the circle wraps around the edges of the world
+    (as the world itself does in Avida); otherwise it is cut off at them.
     """
     # remove "GRADIENT_RESOURCE"
     line = line[18:]
@@ -219,14 +763,38 @@ def parse_gradient(line, world_size):
         elif item.startswith("peaky"):
             y = int(item.split("=")[1])
 
-    # Translate circle to cells)
-    cells = []
-    for i in range(world_size[0]):
-        for j in range(world_size[1]):
-            if (dist((i, j), (x, y))) <= radius-1:
-                cells.append((i, j))
+    return (name, _circle_cells((x, y), radius-1, world_size, toroidal))
 
-    return (name, cells)
+
+def _circle_cells(center, radius, world_size, toroidal=False):
+    """
+    Returns a list of (x, y) tuples for the cells within radius of center,
+    ordered by x and then y. Only the circle's bounding box is examined.
+    """
+    if radius < 0:
+        return []
+
+    reach = int(floor(radius))
+    xs = np.arange(center[0] - reach, center[0] + reach + 1)
+    ys = np.arange(center[1] - reach, center[1] + reach + 1)
+    inside = ((xs[:, np.newaxis] - center[0])**2 +
+              (ys[np.newaxis, :] - center[1])**2) <= radius**2
+    xs, ys = [axis[index] for axis, index in zip((xs, ys),
+                                                  np.nonzero(inside))]
+
+    if toroidal:
+        # Cells can be reached from more than one side if the circle is
+        # bigger than the world, so drop repeats (which also sorts them)
+        xs = xs % world_size[0]
+        ys = ys % world_size[1]
+        cells = np.unique(xs * world_size[1] + ys)
+        xs, ys = cells // world_size[1], cells % world_size[1]
+    else:
+        in_world = (xs >= 0) & (xs < world_size[0]) & \
+                   (ys >= 0) & (ys < world_size[1])
+        xs, ys = xs[in_world], ys[in_world]
+
+    return list(zip(xs.tolist(), ys.tolist()))
 
 
 def parse_cell(line, world_size):
@@ -236,6 +804,29 @@ def parse_cell(line, world_size):
     world, and returns the name of the resource and a list of
     tuples representing the cells it's in.
     """
+    name, ranges = parse_cell_ranges(line)
+
+    # List all cells
+    cells = []
+    for start, stop in ranges:
+        cells.extend(range(start, stop))
+
+    xy_pairs = [(int(c) % world_size[0], int(c)//world_size[0]) for c in cells]
+
+    return (name, xy_pairs)
+
+
+def parse_cell_ranges(line):
+    """
+    Takes a string representing a CELL resource (as specified in Avida
+    environment files) and returns the name of the resource and a list of
+    (start, stop) tuples representing the ranges of cell ids it's in. As
+    with range(), start is included and stop is not, so "5..9" becomes
+    (5, 10) and "12" becomes (12, 13).
+
+    Cell ids count across each row of the world in turn, so cell c is at
+    x = c % world_x, y = c // world_x.
+    """
     # Remove "CELL "
     line = line[4:]
 
@@ -243,21 +834,26 @@ def parse_cell(line, world_size):
     sline = [i.strip() for i in line.split(":")]
     name = sline[0]
     name = reduce_resource_name_to_task(name)
-    cell_components = sline[1].split(",")
-    cells = []
+    cell_components = sline[1].split(",") if len(sline) > 1 else []
+    ranges = []
 
-    # List all cells
-    for i in range(len(cell_components)):
-        if ".." in cell_components[i]:
-            cell_range = [int(j) for j in cell_components[i].split("..")]
-            for j in range(int(cell_range[0]), int(cell_range[1]+1)):
-                cells.append(j)
+    for component in cell_components:
+        component = component.strip()
+        if component == "":
+            continue
+        if ".." in component:
+            start, stop = [int(j) for j in component.split("..")]
+            stop += 1
         else:
-            cells.append(int(cell_components[i]))
-
-    if cells == [""]:
-        return (name, [])
+            start = int(component)
+            stop = start + 1
 
-    xy_pairs = [(int(c) % world_size[0], int(c)//world_size[0]) for c in cells]
+        if stop <= start:
+            continue
+        elif ranges and ranges[-1][1] == start:
+            # Merge runs of consecutive cells (e.g. "1,2,3")
+            ranges[-1] = (ranges[-1][0], stop)
+        else:
+            ranges.append((start, stop))
 
-    return (name, xy_pairs)
+    return (name, ranges)
@@ -4,6 +4,8 @@ import sys
 import glob
 from collections import deque
 import numpy as np
+from scipy import ndimage, sparse
+from scipy.sparse import csgraph
 from scipy.spatial import ConvexHull
 
 
@@ -82,6 +84,103 @@ def get_25_neighbors(cell, world_size=(60, 60)):
     return neighbors
 
 
+# The neighborhood, radius, and toroidal-ness (in the terms used by
+# neighbor_table and spatial_analysis.neighborhood_counts) of each of the
+# neighbor functions above
+NEIGHBORHOODS = {get_moore_neighbors_toroidal: ("moore", 1, True),
+                 get_moore_neighbors: ("moore", 1, False),
+                 get_rook_neighbors_toroidal: ("rook", 1, True),
+                 get_rook_neighbors: ("rook", 1, False),
+                 get_25_neighbors: ("moore", 2, False)}
+
+# Neighbor tables, keyed on the world size and neighborhood they describe.
+# Patch metrics look up the same few tables over and over, so each one is
+# only built once per process.
+_NEIGHBOR_TABLES = {}
+_MAX_NEIGHBOR_TABLES = 64
+
+
+def neighbor_table(world_size=(60, 60), neighborhood="moore", radius=1,
+                   toroidal=True):
+    """
+    Returns an (x*y, n_neighbors) int32 array in which row i lists the
+    neighbors of cell i, where cells are numbered across each row in turn
+    (so that cell (x, y) is number y*world_size[0] + x). Neighbors outside
+    the world (when toroidal is False) are -1. Neighborhoods are described
+    as for spatial_analysis.neighborhood_counts, except that a cell is not
+    its own neighbor, and neighbors are listed in the same order as the
+    corresponding neighbor function gives them.
+
+    Tables are cached and shared, so they are read-only.
+    """
+    key = (tuple(world_size), neighborhood, radius, toroidal)
+    if key in _NEIGHBOR_TABLES:
+        return _NEIGHBOR_TABLES[key]
+
+    if neighborhood == "moore":
+        offsets = [(dx, dy) for dx in range(-radius, radius + 1)
+                   for dy in range(-radius, radius + 1) if dx or dy]
+    elif neighborhood == "rook" and radius == 1:
+        offsets = [(1, 0), (-1, 0), (0, 1), (0, -1)]
+    elif neighborhood == "rook":
+        offsets = [(dx, dy) for dx in range(-radius, radius + 1)
+                   for dy in range(-radius, radius + 1)
+                   if 0 < abs(dx) + abs(dy) <= radius]
+    else:
+        raise ValueError("Unknown neighborhood: " + str(neighborhood))
+
+    world_x, world_y = world_size
+    y, x = np.divmod(np.arange(world_x * world_y), world_x)
+    table = np.empty((world_x * world_y, len(offsets)), dtype=np.int32)
+    for i, (dx, dy) in enumerate(offsets):
+        if toroidal:
+            table[:, i] = ((y + dy) % world_y) * world_x + (x + dx) % world_x
+        else:
+            inside = (x + dx >= 0) & (x + dx < world_x) & \
+                (y + dy >= 0) & (y + dy < world_y)
+            table[:, i] = np.where(inside, (y + dy) * world_x + x + dx, -1)
+
+    table.flags.writeable = False
+    if len(_NEIGHBOR_TABLES) >= _MAX_NEIGHBOR_TABLES:
+        _NEIGHBOR_TABLES.clear()
+    _NEIGHBOR_TABLES[key] = table
+    return table
+
+
+def _patch_table(patch, world_size, neighbor_func):
+    """
+    Returns a tuple of the neighbor table for neighbor_func and the (flat)
+    numbers of the cells in patch, or (None, None) if neighbor_func isn't
+    one of the NEIGHBORHOODS or the patch isn't all inside the world (in
+    which case the caller should use neighbor_func directly).
+    """
+    if neighbor_func not in NEIGHBORHOODS:
+        return None, None
+
+    cells = np.asarray(patch, dtype=int).reshape(-1, 2)
+    if len(cells) and (cells.min() < 0 or cells[:, 0].max() >= world_size[0]
+                       or cells[:, 1].max() >= world_size[1]):
+        return None, None
+
+    neighborhood, radius, toroidal = NEIGHBORHOODS[neighbor_func]
+    table = neighbor_table(world_size, neighborhood, radius, toroidal)
+    return table, cells[:, 1] * world_size[0] + cells[:, 0]
+
+
+def _in_patch(neighbors, cells):
+    """
+    Returns a boolean array saying which of neighbors (flat cell numbers,
+    or -1 for cells outside the world) are in cells. This takes time in
+    proportion to the size of the patch rather than of the world, so small
+    patches in large worlds stay cheap.
+    """
+    if not len(cells):
+        return np.zeros(np.shape(neighbors), dtype=bool)
+    cells = np.sort(cells)
+    positions = np.minimum(np.searchsorted(cells, neighbors), len(cells) - 1)
+    return cells[positions] == neighbors
+
+
 def area(patch):
     return len(patch)
 
@@ -94,6 +193,13 @@ def perimeter(patch, world_size=(60, 60),
     be preserved by merely counting the number of cells that touch
     an edge.
     """
+    table, cells = _patch_table(patch, world_size, neighbor_func)
+    if table is not None:
+        cells = np.unique(cells)
+        neighbors = table[cells]
+        outside = ~_in_patch(neighbors, cells)
+        return int(np.count_nonzero(outside & (neighbors >= 0)))
+
     edge = 0
     patch = set([tuple(i) for i in patch])
     for cell in patch:
@@ -107,6 +213,13 @@ def perimeter(patch, world_size=(60, 60),
 def get_edge_locations(patch, world_size=(60, 60),
                        neighbor_func=get_moore_neighbors_toroidal):
 
+    table, cells = _patch_table(patch, world_size, neighbor_func)
+    if table is not None:
+        cells = np.unique(cells)
+        edge = _edge_mask(table, cells, world_size)
+        return [(int(c % world_size[0]), int(c // world_size[0]))
+                for c in cells[edge]]
+
     edge = []  # list of cells on edge
     patch = set([tuple(i) for i in patch])
 
@@ -124,6 +237,16 @@ def isedge(cell, patch, world_size=(60, 60),
     return bool(neighbors)
 
 
+def _edge_mask(table, cells, world_size):
+    """
+    Returns a boolean array saying which of cells (unique flat cell
+    numbers) has a neighbor in the world that is not in cells.
+    """
+    neighbors = table[cells]
+    outside = ~_in_patch(neighbors, cells)
+    return (outside & (neighbors >= 0)).any(axis=1)
+
+
 def in_bounds(cell, world_size=(60, 60)):
     return cell[0] >= 0 and cell[0] < world_size[0] and \
         cell[1] >= 0 and cell[1] < world_size[1]
@@ -131,6 +254,11 @@ def in_bounds(cell, world_size=(60, 60)):
 
 def weighted_perimeter(patch, world_size=(60, 60),
                        neighbor_func=get_rook_neighbors_toroidal):
+    table, cells = _patch_table(patch, world_size, neighbor_func)
+    if table is not None:
+        inside = _in_patch(table[cells], cells)
+        return float(np.sum((8.0 - inside.sum(axis=1))/8.0))
+
     edge = 0
     for cell in patch:
         neighbors = neighbor_func(cell, world_size)
@@ -160,6 +288,77 @@ def radius_of_gyration(patch):
     return dist_sum/len(patch)
 
 
+def toroidal_centroid(patch, world_size=(60, 60), labels=None):
+    """
+    Like centroid, but for a world that wraps around at its edges, so that
+    a patch crossing an edge gets a centroid inside the patch rather than
+    in the middle of the world. Cells are moved to whichever copy of them
+    (a multiple of the world size away) is nearest the circular mean of the
+    patch before averaging, so patches less than half the width of the
+    world that don't cross an edge get the same centroid as from centroid.
+
+    patch can be a list or array of cells. To handle many patches at once,
+    pass the cells of all of them as patch and the number of the patch that
+    each cell is in as labels; the result is then an (n_patches, 2) array.
+    """
+    centers, counts = _unwrap_patches(patch, world_size, labels)[2:]
+    centers %= world_size
+    centers[counts == 0] = 0
+
+    if labels is None:
+        return tuple(centers[0])
+    return centers
+
+
+def toroidal_radius_of_gyration(patch, world_size=(60, 60), labels=None):
+    """
+    Like radius_of_gyration, but measuring distances around the edges of
+    the world from the toroidal_centroid. Takes the same arguments as
+    toroidal_centroid, and similarly returns an array of the radius of each
+    patch if labels is given.
+    """
+    cells, labels_used, centers, counts = _unwrap_patches(patch, world_size,
+                                                          labels)
+    dists = np.hypot(*(cells - centers[labels_used]).T)
+    radii = np.bincount(labels_used, dists, len(counts)) / \
+        np.maximum(counts, 1)
+
+    if labels is None:
+        return radii[0]
+    return radii
+
+
+def _unwrap_patches(patch, world_size, labels=None):
+    """
+    Returns a tuple of:
+    - the cells in patch (as an n x 2 array of floats), each moved to the
+      copy of itself nearest the circular mean of its patch
+    - the number of the patch each cell is in (all 0 if labels is None)
+    - the mean of the moved cells in each patch
+    - the number of cells in each patch
+    """
+    cells = np.asarray(patch, dtype=float).reshape(-1, 2)
+    size = np.array(world_size, dtype=float)
+    if labels is None:
+        labels = np.zeros(len(cells), dtype=int)
+    labels = np.asarray(labels, dtype=int)
+    n_patches = labels.max() + 1 if len(labels) else 1
+    counts = np.bincount(labels, minlength=n_patches)
+
+    angles = cells * (2 * pi / size)
+    circular_mean = np.column_stack(
+        [np.arctan2(np.bincount(labels, np.sin(angles[:, i]), n_patches),
+                    np.bincount(labels, np.cos(angles[:, i]), n_patches))
+         for i in range(2)]) * (size / (2 * pi))
+
+    # Shifting by whole world sizes keeps integer coordinates exact
+    cells -= np.floor((cells - circular_mean[labels]) / size + .5) * size
+    centers = np.column_stack(
+        [np.bincount(labels, cells[:, i], n_patches) for i in range(2)]) / \
+        np.maximum(counts, 1)[:, np.newaxis]
+    return cells, labels, centers, counts
+
+
 def perimeter_area_ratio(patch, world_size=(60, 60),
                          neighbor_func=get_rook_neighbors_toroidal):
     return float(perimeter(patch, world_size=world_size,
@@ -214,23 +413,24 @@ def related_circumscribing_circle(patch, formula=True, world_size=(60, 60)):
     produces some strange artifacts for small patches and less precisely
     approximates the values reported in the original paper introducing this
     metric (Baker and Cai, 1992). It will also be slightly slower.
+
+    The diameter of the circle is the longest straight line across the
+    patch, after unwrapping it across the edges of the world (as for
+    toroidal_centroid). Patches that cross an edge are therefore measured
+    across it. Patches wider than half the world are measured across their
+    full width.
     """
     patch_area = float(area(patch))
-    max_dist = 0.0
-    cell_pair = (None, None)
 
+    # Measuring the patch after unwrapping it (as for toroidal_centroid)
+    # means that patches crossing the edges of the world are measured
+    # across those edges
+    cells = _unwrap_patches(patch, world_size)[0]
     try:
-        hull = ConvexHull(patch)
-        edge = list(np.array(patch)[hull.vertices])
+        hull = ConvexHull(cells)
+        max_dist, cell_pair = _hull_diameter(cells[hull.vertices])
     except:
-        edge = patch
-
-    for i, cell1 in enumerate(edge):
-        for j, cell2 in enumerate(edge[i+1:]):
-            squared_dist = squared_toroidal_dist(cell1, cell2, world_size)
-            if squared_dist > max_dist:
-                max_dist = squared_dist
-                cell_pair = (cell1, cell2)
+        max_dist, cell_pair = _points_diameter(cells)
 
     radius = sqrt(max_dist)/2.0  # only take sqrt once
 
@@ -250,19 +450,71 @@ def related_circumscribing_circle(patch, formula=True, world_size=(60, 60)):
     # infinite sum, so brute force will be more
     # precise
 
-    circle_area = 0.0
-    x_floor = int(floor(center[0]-radius))
-    x_ceil = int(ceil(center[0]+radius)+1)
+    x = np.arange(int(floor(center[0]-radius)),
+                  int(ceil(center[0]+radius)+1))[:, np.newaxis]
+    y = np.arange(int(floor(center[1]-radius)),
+                  int(ceil(center[1]+radius)+1))[np.newaxis, :]
+    in_circle = np.sqrt((x-center[0])**2 + (y-center[1])**2) <= radius
+    circle_area = float(np.count_nonzero(in_circle))
 
-    y_floor = int(floor(center[1]-radius))
-    y_ceil = int(ceil(center[1]+radius)+1)
+    return 1 - (patch_area/circle_area)
 
-    for x in range(x_floor, x_ceil):
-        for y in range(y_floor, y_ceil):
-            if dist((x, y), center) <= radius:
-                circle_area += 1
 
-    return 1 - (patch_area/circle_area)
+def _hull_diameter(points):
+    """
+    Finds the two points furthest apart on a convex polygon (an array of
+    its vertices in counterclockwise order, as from ConvexHull) using
+    rotating calipers: the furthest pair is always among the vertices
+    furthest from each edge, and these can be found in a single pass around
+    the polygon.
+
+    Returns: a tuple of the squared distance between the points and the
+    pair of points. Ties go to the pair that comes first in the order of
+    points.
+    """
+    points = points.tolist()
+    n_points = len(points)
+
+    def twice_area(a, b, c):
+        return abs((b[0]-a[0])*(c[1]-a[1]) - (b[1]-a[1])*(c[0]-a[0]))
+
+    max_dist = -1
+    best = None
+    j = 1
+    for i in range(n_points):
+        a = points[i]
+        b = points[(i+1) % n_points]
+        while twice_area(a, b, points[(j+1) % n_points]) > \
+                twice_area(a, b, points[j]):
+            j = (j+1) % n_points
+
+        # An edge parallel to (a, b) has two vertices furthest from it
+        for k in [i, (i+1) % n_points]:
+            for m in [j, (j+1) % n_points]:
+                pair = (min(k, m), max(k, m))
+                squared_dist = (points[k][0]-points[m][0])**2 + \
+                    (points[k][1]-points[m][1])**2
+                if squared_dist > max_dist or \
+                        (squared_dist == max_dist and pair < best):
+                    max_dist = squared_dist
+                    best = pair
+
+    return max_dist, (points[best[0]], points[best[1]])
+
+
+def _points_diameter(points):
+    """
+    Finds the two points furthest apart in an array of points (such as a
+    patch with no convex hull, because it is a line) by comparing every
+    pair. Returns the same as _hull_diameter.
+    """
+    if len(points) < 2:
+        return 0.0, (None, None)
+
+    squared_dists = ((points[:, np.newaxis] - points[np.newaxis])**2).sum(2)
+    squared_dists[np.tril_indices(len(points))] = -1
+    i, j = np.unravel_index(np.argmax(squared_dists), squared_dists.shape)
+    return squared_dists[i, j], (points[i], points[j])
 
 
 def contiguity_index(patch):
@@ -289,6 +541,10 @@ def contiguity_index(patch):
 
 def core_area(patch, distance, world_size=(60, 60),
               neighbor_func=get_moore_neighbors_toroidal):
+    core = _core_cells(patch, distance, world_size, neighbor_func)
+    if core is not None:
+        return int(np.count_nonzero(core))
+
     edge = get_edge_locations(patch, world_size=world_size,
                               neighbor_func=neighbor_func)
     core_area = 0
@@ -304,6 +560,12 @@ def core_area(patch, distance, world_size=(60, 60),
 
 def number_core_areas(patch, distance, world_size=(60, 60),
                       neighbor_func=get_moore_neighbors_toroidal):
+    core = _core_cells(patch, distance, world_size, neighbor_func)
+    if core is not None:
+        core_patch = [cell for cell, is_core in zip(patch, core) if is_core]
+        return len(traverse_core(core_patch, world_size=world_size,
+                                 neighbor_func=neighbor_func))
+
     core_patch = []
     edge = get_edge_locations(patch, world_size=world_size,
                               neighbor_func=neighbor_func)
@@ -320,17 +582,21 @@ def number_core_areas(patch, distance, world_size=(60, 60),
 
 def get_core_areas(patch, distance, world_size=(60, 60),
                    neighbor_func=get_moore_neighbors_toroidal):
-    core_patch = []
-    # edge = get_edge_locations(patch, world_size)
-    squared_distance = distance*distance
+    core = _core_cells(patch, distance, world_size, neighbor_func)
+    if core is not None:
+        core_patch = set(tuple(cell) for cell, is_core in zip(patch, core)
+                         if is_core)
+        return traverse_core(list(core_patch), world_size=world_size,
+                             neighbor_func=neighbor_func)
 
+    core_patch = []
     patch = set([tuple(i) for i in patch])
 
     edges = set()
 
     for cell in patch:
         if cell in edges:
-            if squared_distance == 0:
+            if distance == 0:
                 core_patch.append(cell)
             continue
 
@@ -365,14 +631,66 @@ def get_core_areas(patch, distance, world_size=(60, 60),
                     break
                 curr = queue.popleft()
 
-        if dist_to_edge >= squared_distance:
-            # squared distance is more efficient
+        if dist_to_edge >= distance:
             core_patch.append(cell)
 
     return traverse_core(core_patch, world_size=world_size,
                          neighbor_func=neighbor_func)
 
 
+def _core_cells(patch, distance, world_size, neighbor_func):
+    """
+    Returns a boolean array saying which cells in patch are at least
+    distance from the nearest cell on the edge of the patch (measured
+    toroidally, as by toroidal_dist), or None if the patch isn't all inside
+    the world or has no edge.
+
+    Distances come from a single Euclidean distance transform. Usually this
+    covers just the patch's bounding box (plus a one-cell margin), after
+    unwrapping it across the edges of the world as for toroidal_centroid.
+    If the patch spans more than half the world, straight-line distances
+    between its cells might not be toroidal distances, so the transform
+    covers a 3x3 tiling of the world instead, in which the nearest edge
+    cell to each cell in the middle tile is the nearest one on the torus.
+    """
+    cells = np.asarray(patch, dtype=int).reshape(-1, 2)
+    world_x, world_y = world_size
+    if not len(cells) or cells.min() < 0 or cells[:, 0].max() >= world_x \
+            or cells[:, 1].max() >= world_y:
+        return None
+
+    edge = set(get_edge_locations(patch, world_size=world_size,
+                                  neighbor_func=neighbor_func))
+    if not edge:
+        return None
+    is_edge = np.array([tuple(cell) in edge for cell in cells.tolist()])
+
+    unwrapped = _unwrap_patches(cells, world_size)[0].astype(int)
+    low = unwrapped.min(axis=0)
+    high = unwrapped.max(axis=0)
+    if np.all(high - low <= np.array(world_size) / 2.0):
+        cells = unwrapped - low + 1
+        box_x, box_y = high - low + 3
+        not_edge = np.ones((box_y, box_x), dtype=bool)
+        not_edge[cells[is_edge, 1], cells[is_edge, 0]] = False
+    else:
+        not_edge = np.ones((world_y, world_x), dtype=bool)
+        not_edge[cells[is_edge, 1], cells[is_edge, 0]] = False
+        not_edge = np.tile(not_edge, (3, 3))
+        cells = cells + world_size
+    nearest = ndimage.distance_transform_edt(not_edge,
+                                             return_distances=False,
+                                             return_indices=True)
+
+    # Squared distances are exact integers, so taking their square root
+    # gives exactly what toroidal_dist would
+    y = cells[:, 1]
+    x = cells[:, 0]
+    delta_y = nearest[0][y, x] - y
+    delta_x = nearest[1][y, x] - x
+    return np.sqrt(delta_x * delta_x + delta_y * delta_y) >= distance
+
+
 def traverse_core(core_area, world_size=(60, 60),
                   neighbor_func=get_moore_neighbors_toroidal):
     """
@@ -382,6 +700,32 @@ def traverse_core(core_area, world_size=(60, 60),
 
     if not core_area:
         return []
+
+    table, cells = _patch_table(core_area, world_size, neighbor_func)
+    if table is not None:
+        # Only the rows for cells in the core are ever needed, so they are
+        # read one at a time rather than converting the whole table
+        world_x = world_size[0]
+        curr = int(cells[0])
+        core_area = set(cells[1:].tolist())
+        to_explore = []
+        cores = [[curr]]
+
+        while core_area:
+            for n in table[curr].tolist():
+                if n in core_area:
+                    core_area.remove(n)
+                    to_explore.append(n)
+                    cores[-1].append(n)
+
+            if to_explore:
+                curr = to_explore.pop()
+            else:
+                curr = core_area.pop()
+                cores.append([curr])
+
+        return [[(c % world_x, c // world_x) for c in core] for core in cores]
+
     core_area = [tuple(i) for i in core_area]
     curr = core_area[0]
     core_area = set(core_area[1:])
@@ -406,6 +750,140 @@ def traverse_core(core_area, world_size=(60, 60),
     return cores
 
 
+def label_patches(world, neighborhood="moore", toroidal=True,
+                  background=None):
+    """
+    Finds every patch (connected group of cells with the same value) in
+    world (a 2d list or array) in one pass. Cells are connected to their
+    rook (4) or moore (8) neighbors, including across the edges of the
+    world if toroidal is True. Cells equal to background (e.g. -1 for
+    empty cells) are not part of any patch.
+
+    Returns: a tuple of a 2d array giving the number of the patch that
+    each cell is in (-1 for background cells), with patches numbered in
+    the order that their first cells appear in the world, and a list of
+    arrays of the (flat) numbers of the cells in each patch, in the same
+    order. Cell (x, y) is number y*len(world[0]) + x, as for
+    neighbor_table.
+    """
+    values, categories = np.unique(np.asarray(world), return_inverse=True)
+    rows, cols = np.shape(world)
+    categories = categories.ravel()
+    n_cells = rows * cols
+
+    table = neighbor_table((cols, rows), neighborhood, 1, toroidal)
+    cells = np.repeat(np.arange(n_cells), table.shape[1])
+    neighbors = table.ravel()
+    linked = neighbors >= 0
+    linked[linked] = categories[cells[linked]] == \
+        categories[neighbors[linked]]
+    graph = sparse.coo_matrix((np.ones(np.count_nonzero(linked), np.int8),
+                               (cells[linked], neighbors[linked])),
+                              shape=(n_cells, n_cells))
+    labels = csgraph.connected_components(graph, directed=False)[1]
+
+    if background is not None:
+        in_patch = values[categories] != background
+    else:
+        in_patch = np.ones(n_cells, dtype=bool)
+
+    # Renumber the patches in order of their first cells, leaving out the
+    # background
+    first_cells = np.unique(labels[in_patch], return_index=True)[1]
+    order = np.empty(labels.max() + 1, dtype=int)
+    order[labels[in_patch][np.sort(first_cells)]] = \
+        np.arange(len(first_cells))
+    labels = np.where(in_patch, order[labels], -1)
+
+    patches = []
+    if len(first_cells):
+        by_label = np.argsort(labels, kind="mergesort")
+        sizes = np.bincount(labels[in_patch])
+        patches = np.split(by_label[n_cells - np.count_nonzero(in_patch):],
+                           np.cumsum(sizes)[:-1])
+    return labels.reshape(rows, cols), patches
+
+
+def patch_metrics(labels, toroidal=True, formula=True):
+    """
+    Calculates the area, perimeter, shape_index, fractal_dimension,
+    contiguity_index, radius_of_gyration, and related_circumscribing_circle
+    of every patch in labels (a 2d array of patch numbers, -1 for cells that
+    aren't in a patch, as returned by label_patches) at once.
+
+    Perimeters count faces shared with rook neighbors in other patches,
+    wrapping around the edges of the world if toroidal is True (like the
+    default neighbor function for perimeter). formula is passed on to
+    related_circumscribing_circle.
+
+    Returns: a dictionary of arrays, one for each metric plus "label",
+    holding the value for each patch number in turn. Each value is the same
+    as the corresponding function gives for the list of cells in the patch.
+    """
+    labels = np.asarray(labels)
+    rows, cols = labels.shape
+    world_size = (cols, rows)
+
+    # Out-of-bounds entries in neighbor tables (-1) pick out the -2 on the
+    # end, which never matches a patch number or the background
+    flat_labels = np.append(labels.ravel(), -2)
+    cells = np.flatnonzero(labels.ravel() >= 0)
+    own = flat_labels[cells]
+    n_patches = own.max() + 1 if len(own) else 0
+    x = cells % cols
+    y = cells // cols
+
+    patch_area = np.bincount(own, minlength=n_patches)
+    empty = patch_area == 0
+    safe_area = np.where(empty, 1, patch_area).astype(float)
+
+    rook = flat_labels[neighbor_table(world_size, "rook", 1,
+                                      toroidal)[cells]]
+    faces = ((rook != own[:, np.newaxis]) & (rook != -2)).sum(axis=1)
+    perim = np.bincount(own, faces, minlength=n_patches)
+
+    # As in contiguity_index, rook neighbors count 2 and diagonal neighbors
+    # count 1, and patches don't wrap around the edges of the world
+    moore = flat_labels[neighbor_table(world_size, "moore", 1,
+                                       False)[cells]]
+    weights = [1 if dx and dy else 2 for dx in [-1, 0, 1]
+               for dy in [-1, 0, 1] if dx or dy]
+    contiguity = np.bincount(own, (moore == own[:, np.newaxis]).dot(weights),
+                             minlength=n_patches)
+
+    center_x = np.bincount(own, x, minlength=n_patches) / safe_area
+    center_y = np.bincount(own, y, minlength=n_patches) / safe_area
+    dist_sum = np.bincount(own, np.hypot(x - center_x[own],
+                                         y - center_y[own]),
+                           minlength=n_patches)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fractal = 2 * np.log(.25 * perim) / np.log(safe_area)
+    fractal[perim == 0] = -1
+    fractal[patch_area == 1] = 1
+    fractal[empty] = -1
+
+    circle = np.zeros(n_patches)
+    by_label = np.argsort(own, kind="mergesort")
+    patches = np.split(np.column_stack((x, y))[by_label],
+                       np.cumsum(patch_area)[:-1])
+    for i, patch in enumerate(patches):
+        if len(patch):
+            circle[i] = related_circumscribing_circle(patch.tolist(), formula,
+                                                      world_size)
+
+    return {"label": np.arange(n_patches),
+            "area": patch_area,
+            "perimeter": perim.astype(int),
+            "shape_index": np.where(empty, 0,
+                                    .25 * perim / np.sqrt(safe_area)),
+            "fractal_dimension": fractal,
+            "contiguity_index": np.where(
+                empty, 0, (contiguity / safe_area - 1) / (13 - 1)),
+            "radius_of_gyration": np.where(empty, 0, dist_sum / safe_area),
+            "related_circumscribing_circle": circle}
+
+
 def core_area_index(patch, distance):
     core = float(core_area(patch, distance))
     patch_area = float(area(patch))
@@ -1,10 +1,15 @@
+from functools import partial
 from pysal.esda.getisord import G_Local
-from collections import Counter
+from scipy import sparse
 from .utils import *
 from .patch_analysis import *
 from .landscape_stats import *
 
 
+# Largest number of counts that diversity_raster converts to floats at once
+_MAX_ENTROPY_CHUNK = 2 ** 22
+
+
 def diversity_map_spatial_weights(world, weights):
     return make_diversity_map(world, weights=weights)
 
@@ -17,31 +22,193 @@ def make_diversity_map(world, neighbor_func=None, weights=None):
     world_x = len(world[0])
     world_y = len(world)
 
-    data = initialize_grid((world_x, world_y), -1)
+    if weights is None and not neighbor_func:
+        raise RuntimeError("""Diversity map needs a neighbor_func or
+                           weights matrix.""")
+
+    if weights is not None:
+        return diversity_raster(world, weights=weights).tolist()
+
+    if neighbor_func in NEIGHBORHOODS:
+        neighborhood, radius, toroidal = NEIGHBORHOODS[neighbor_func]
+        return diversity_raster(world, neighborhood, radius,
+                                toroidal).tolist()
+
+    # Number the values in the world so that each cell's neighborhood can
+    # be tallied in a row of a (cells, values) array of counts
+    categories = np.unique(np.asarray(world).ravel(),
+                           return_inverse=True)[1].reshape(world_y, world_x)
+    counts = np.zeros((world_y, world_x, categories.max() + 1))
 
     for y in range(world_y):
         for x in range(world_x):
-            local_vals = Counter()
+            neighbors = neighbor_func([x, y], (world_x, world_y))
+            neighbors.append([x, y])
+
+            for n in neighbors:
+                counts[y, x, categories[n[1], n[0]]] += 1
+
+    return entropy_array(counts).tolist()
+
+
+def neighborhood_counts(world, neighborhood="moore", radius=1,
+                        toroidal=True):
+    """
+    Counts the values in the neighborhood of every cell in world (a 2d list
+    or array) at once.
+
+    Arguments:
+        neighborhood - "moore" for the square of cells within radius of each
+                       cell in both directions, or "rook" (von Neumann) for
+                       the cells within radius steps horizontally and
+                       vertically.
+        radius - the size of the neighborhood. Each cell's neighborhood
+                 includes the cell itself.
+        toroidal - whether neighborhoods wrap around the edges of the world.
+
+    Returns: a tuple of a (rows, cols, n_values) array in which
+    counts[y][x][k] is the number of times values[k] appears in the
+    neighborhood of (x, y), and the array of values.
+    """
+    if neighborhood not in ["moore", "rook"]:
+        raise ValueError("Unknown neighborhood: " + str(neighborhood))
+
+    values, categories = np.unique(np.asarray(world), return_inverse=True)
+    categories = categories.reshape(np.shape(world))
+    dtype = np.min_scalar_type((2 * radius + 1) ** 2)
+    one_hot = (categories[:, :, np.newaxis] ==
+               np.arange(len(values))).astype(dtype)
+
+    offsets = range(-radius, radius + 1)
+    if neighborhood == "moore":
+        # The square kernel is separable, so sum along each axis in turn
+        rows = sum(_shift(one_hot, 0, dx, toroidal) for dx in offsets)
+        counts = sum(_shift(rows, dy, 0, toroidal) for dy in offsets)
+    else:
+        counts = sum(_shift(one_hot, dy, dx, toroidal)
+                     for dy in offsets for dx in offsets
+                     if abs(dx) + abs(dy) <= radius)
+
+    return counts.astype(dtype), values
+
+
+def weighted_neighborhood_counts(world, weights):
+    """
+    Counts the values in the neighborhood of every cell in world (a 2d list
+    or array) at once, with neighborhoods defined by a spatial weights
+    object (e.g. from make_toroidal_weights or pysal) in which cells are
+    numbered across each row in turn. Each cell counts once towards its own
+    neighborhood and each of its neighbors counts for its weight.
+
+    weights can also be a sparse matrix from spatial_weights_matrix, which
+    saves rebuilding it for every world.
+
+    Returns: a tuple of a (rows, cols, n_values) array of (weighted) counts,
+    as for neighborhood_counts, and the array of values.
+    """
+    values, categories = np.unique(np.asarray(world), return_inverse=True)
+    rows, cols = np.shape(world)
+
+    if not sparse.issparse(weights):
+        weights = spatial_weights_matrix(weights, rows * cols)
+
+    one_hot = sparse.csr_matrix((np.ones(rows * cols),
+                                 (np.arange(rows * cols),
+                                  categories.ravel())),
+                                shape=(rows * cols, len(values)))
+    counts = weights.dot(one_hot).toarray()
+    return counts.reshape(rows, cols, len(values)), values
+
+
+def spatial_weights_matrix(weights, n_cells):
+    """
+    Converts a spatial weights object for a world with n_cells cells into
+    a sparse (CSR) matrix in which entry [i, j] is the total weight of cell
+    j in the neighborhood of cell i (repeated neighbors are added up), plus
+    1 on the diagonal for each cell itself.
+    """
+    rows = list(range(n_cells))
+    cols = list(range(n_cells))
+    data = [1.0] * n_cells
+
+    for i in range(n_cells):
+        neighbors = weights.neighbors[i]
+        rows.extend([i] * len(neighbors))
+        cols.extend(neighbors)
+        data.extend(weights.weights[i])
+
+    # Converting from COO format sums duplicate entries
+    return sparse.coo_matrix((data, (rows, cols)),
+                             shape=(n_cells, n_cells)).tocsr()
+
+
+def diversity_raster(world, neighborhood="moore", radius=1, toroidal=True,
+                     index="shannon", weights=None):
+    """
+    Calculates the diversity of the values in the neighborhood of every
+    cell in world (a 2d list or array), as a 2d array. Neighborhoods are
+    described by the same arguments as for neighborhood_counts, or by
+    spatial weights (see weighted_neighborhood_counts) if weights is given.
+    index is any of the diversity indices supported by entropy_array (by
+    default, Shannon entropy).
+    """
+    if weights is not None:
+        counts = weighted_neighborhood_counts(world, weights)[0]
+    else:
+        counts = neighborhood_counts(world, neighborhood, radius,
+                                     toroidal)[0]
+    rows, cols, n_values = counts.shape
+
+    result = np.empty((rows, cols))
+    step = max(1, _MAX_ENTROPY_CHUNK // (cols * n_values))
+    for y in range(0, rows, step):
+        result[y:y + step] = entropy_array(counts[y:y + step], index)
+    return result
+
+
+def diversity_cube(data, neighborhood="moore", radius=1, toroidal=True,
+                   index="shannon", weights=None, workers=None):
+    """
+    Calculates diversity maps for a whole time series at once. data is a
+    3d list or array indexed by row, column, and time point (as returned by
+    load_grid_data), and the result is a (rows, cols, time) array holding
+    the diversity_raster of each time point.
+
+    The values are numbered once across the whole series, and spatial
+    weights are converted to a sparse matrix once, rather than for every
+    time point. If workers is greater than 1, time points are handed out to
+    a pool of that many processes (see map_in_pool).
+    """
+    values, categories = np.unique(np.asarray(data), return_inverse=True)
+    rows, cols, n_times = np.shape(data)
+    categories = categories.reshape(rows, cols, n_times)
 
-            if weights:
-                neighbors = weights.neighbors[world_x*y + x]
-                local_vals = Counter()
-                local_vals[world[y][x]] += 1
-                for i, n in enumerate(neighbors):
-                    local_vals[world[n // world_x][n % world_x]] \
-                        += weights.weights[world_x*y + x][i]
+    if weights is not None and not sparse.issparse(weights):
+        weights = spatial_weights_matrix(weights, rows * cols)
 
-            elif neighbor_func:
-                neighbors = neighbor_func([x, y], (world_x, world_y))
-                neighbors.append([x, y])
+    func = partial(diversity_raster, neighborhood=neighborhood, radius=radius,
+                   toroidal=toroidal, index=index, weights=weights)
+    slices = [categories[:, :, t] for t in range(n_times)]
 
-                for n in neighbors:
-                    local_vals[world[n[1]][n[0]]] += 1
+    result = np.empty((rows, cols, n_times))
+    for t, raster in enumerate(map_in_pool(func, slices, workers)):
+        result[:, :, t] = raster
+    return result
 
-            else:
-                raise RuntimeError("""Diversity map needs a neighbor_func or
-                                   weights matrix.""")
 
-            data[y][x] = entropy(dict(local_vals))
+def _shift(grid, dy, dx, toroidal=True):
+    """
+    Returns grid shifted dy cells down and dx cells right, so that
+    result[y][x] == grid[y - dy][x - dx]. Cells shifted in from outside the
+    world are either wrapped around from the other side (if toroidal) or 0.
+    """
+    if toroidal:
+        return np.roll(np.roll(grid, dy, axis=0), dx, axis=1)
 
-    return data
+    result = np.zeros_like(grid)
+    rows, cols = grid.shape[:2]
+    if abs(dy) >= rows or abs(dx) >= cols:
+        return result
+    result[max(dy, 0):rows + min(dy, 0), max(dx, 0):cols + min(dx, 0)] = \
+        grid[max(-dy, 0):rows + min(-dy, 0), max(-dx, 0):cols + min(-dx, 0)]
+    return result
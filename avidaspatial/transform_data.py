@@ -70,7 +70,7 @@ def rank_clusters(cluster_dict):
     # Figure out the relative rank of each cluster
     cluster_ranks = dict.fromkeys(cluster_dict.keys())
     for key in cluster_dict:
-        cluster_ranks[key] = eval(string_avg(cluster_dict[key], binary=True))
+        cluster_ranks[key] = int(bitwise_majority(cluster_dict[key]), 2)
 
     i = len(cluster_ranks)
     for key in sorted(cluster_ranks, key=cluster_ranks.get):
@@ -222,12 +222,16 @@ def rank_types(types):
 
 def make_count_grid(data):
     """
-    Takes a 2 or 3d grid of strings representing binary numbers.
+    Takes a 2 or 3d grid of strings representing binary numbers (or of
+    integer phenotypes, including numpy arrays of them).
 
     Returns a grid of the same dimensions in which each binary number has been
     replaced by an integer indicating the number of ones that were in that
     number.
     """
+    if isinstance(data, np.ndarray):
+        return popcount(data)
+
     data = deepcopy(data)
 
     for i in range(len(data)):
@@ -235,19 +239,26 @@ def make_count_grid(data):
             for k in range(len(data[i][j])):
                 if type(data[i][j][k]) is list:
                     for l in range(len(data[i][j][k])):
-                        try:
-                            data[i][j][k] = data[i][j][k][l].count("1")
-                        except:
-                            data[i][j][k] = len(data[i][j][k][l])
+                        data[i][j][k] = _count_ones(data[i][j][k][l])
                 else:
-                    try:
-                        data[i][j][k] = data[i][j][k].count("1")
-                    except:
-                        data[i][j][k] = len(data[i][j][k])
+                    data[i][j][k] = _count_ones(data[i][j][k])
 
     return data
 
 
+def _count_ones(value):
+    """
+    Returns the number of ones in a binary string or integer phenotype, or
+    the number of items in anything else (e.g. a set of resources).
+    """
+    if isinstance(value, (int, np.integer)):
+        return popcount(value)
+    try:
+        return value.count("1")
+    except:
+        return len(value)
+
+
 def make_optimal_phenotype_grid(environment, phenotypes):
     """
     Takes an EnvironmentFile object and a 2d array of phenotypes and returns
@@ -279,23 +290,87 @@ def make_optimal_phenotype_grid(environment, phenotypes):
 
 def task_percentages(data, n_tasks=9):
     """
-    Takes a 3D array of strings representing binary numbers and calculates
-    the percentage of organisms in each cell (across multiple files)
-    that were doing a given task.
+    Takes a 3D array of strings representing binary numbers (or integer
+    phenotypes) and calculates the percentage of organisms in each cell
+    (across multiple files) that were doing a given task.
 
     Returns an m x n x n_tasks array indicating the percentages of organisms
     at each location (across the 3rd dimension) that were doing each task.
+    If data is a numpy array, so is the result.
     """
+    if isinstance(data, np.ndarray):
+        digits = _task_digits(data.astype(np.int64), n_tasks)
+        return digits.sum(axis=2) / data.shape[2]
+
     pdata = deepcopy(data)
     for i in range(len(data)):
         for j in range(len(data[0])):
             percentages = [0.0]*n_tasks
             for k in range(len(data[i][j])):
-                b_ind = data[i][j][k].find("b")
-                for l in range(b_ind+1, len(data[i][j][k])):
-                    percentages[l-2] += int(data[i][j][k][l])
+                phenotype = data[i][j][k]
+                if not isinstance(phenotype, str):
+                    phenotype = bin(phenotype)
+                b_ind = phenotype.find("b")
+                for l in range(b_ind+1, len(phenotype)):
+                    percentages[l-2] += int(phenotype[l])
             for p in range(len(percentages)):
                 percentages[p] /= len(data[i][j])
             pdata[i][j] = percentages
 
     return pdata
+
+
+def stream_task_percentages(snapshots, n_tasks=9):
+    """
+    Streaming version of task_percentages. Takes an iterable of 2d grids of
+    phenotypes (binary strings or integers), such as the one returned by
+    iter_grid_data, and calculates the percentage of snapshots in which the
+    organism in each cell was doing a given task, reading one snapshot at a
+    time.
+
+    Returns an m x n x n_tasks array (a numpy array if the snapshots were
+    numpy arrays, nested lists otherwise).
+    """
+    totals = None
+    n = 0
+
+    for snapshot in snapshots:
+        as_array = isinstance(snapshot, np.ndarray)
+        values = pack_phenotypes(snapshot)
+        if totals is None:
+            totals = np.zeros(values.shape + (n_tasks,))
+        totals += _task_digits(values, n_tasks)
+        n += 1
+
+    if totals is None:
+        raise ValueError("No snapshots to aggregate")
+
+    if as_array:
+        return totals / n
+    return (totals / n).tolist()
+
+
+def _task_digits(values, n_tasks):
+    """
+    Takes an array of integer phenotypes and returns an array with an extra
+    dimension of length n_tasks holding the digits of bin() of each value,
+    in the positions that task_percentages reads them from.
+    """
+    magnitudes = np.abs(values)
+    lengths = np.maximum(bit_length(values), 1)
+    offsets = (values < 0).astype(np.int64)  # skip the "-" in "-0b..."
+
+    if (lengths + offsets).max() > n_tasks:
+        raise IndexError("Phenotypes have more digits than n_tasks")
+
+    digits = np.zeros(values.shape + (n_tasks,))
+    for p in range(int(lengths.max())):
+        shift = lengths - 1 - p
+        digit = (magnitudes >> np.maximum(shift, 0)) & 1
+        digit[shift < 0] = 0
+        for offset in (0, 1):
+            if p + offset < n_tasks:
+                digits[..., p + offset] += np.where(offsets == offset,
+                                                    digit, 0)
+
+    return digits
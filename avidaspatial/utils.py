@@ -2,9 +2,13 @@
 
 from math import sqrt, log, floor, ceil
 from copy import deepcopy
+from collections import Counter
+import itertools
+import multiprocessing
 import pysal
 import numpy as np
 from .environment_file import *
+from .grid_cache import load_cached_grid
 import seaborn as sns
 
 
@@ -78,21 +82,75 @@ def agg_grid(grid, agg=None):
     This function facilitates this analysis by calling the given aggregation
     function (agg) on each cell of the given grid and returning the result.
 
-    agg - A function indicating how to summarize grid contents. Default: len.
-    """
-    grid = deepcopy(grid)
+    The grid may also be a 3d numpy array (e.g. from load_grid_data with
+    as_array=True), in which case the result is a 2d numpy array. The input
+    grid is never modified or copied. mode, mean, median, and string_avg
+    are computed for every cell at once along the third axis when the grid
+    is (or converts to) a rectangular array of numbers or strings; any other
+    agg is called on each cell. Ties in mode go to the smallest value.
 
+    agg - A function indicating how to summarize grid contents.
+          Default: string_avg for lists of strings, mode otherwise. There is
+          no default for numpy arrays, since phenotypes are stored in them
+          as integers and mode would silently replace string_avg; a
+          ValueError is raised if agg isn't given.
+    """
     if agg is None:
+        if isinstance(grid, np.ndarray):
+            raise ValueError("agg_grid needs an aggregation function (agg) "
+                             "for numpy arrays")
         if type(grid[0][0]) is list and type(grid[0][0][0]) is str:
             agg = string_avg
         else:
             agg = mode
 
-    for i in range(len(grid)):
-        for j in range(len(grid[i])):
-            grid[i][j] = agg(grid[i][j])
+    if agg in _AXIS_AGGREGATIONS:
+        values = grid if isinstance(grid, np.ndarray) else _stacked_grid(grid)
+        if values is not None and (values.dtype.kind in "iuf" or
+                                   agg is not mean):
+            try:
+                result = _AXIS_AGGREGATIONS[agg](values)
+            except ValueError:
+                # e.g. string_avg of strings that aren't binary numbers
+                result = None
+            if result is not None and isinstance(grid, np.ndarray):
+                return result
+            elif result is not None:
+                return result.tolist()
 
-    return grid
+    if isinstance(grid, np.ndarray):
+        result = [[agg(list(cell)) for cell in row] for row in grid]
+        return np.array(result)
+
+    new_grid = [[agg(cell) for cell in row] for row in grid]
+
+    if isinstance(grid, EnvironmentFile):
+        return EnvironmentFile(new_grid, grid.resources, grid.size,
+                               grid.name, grid.tasks)
+
+    return new_grid
+
+
+def _stacked_grid(grid):
+    """
+    Returns grid (a 2d list containing equal-length lists of integers or
+    strings) as a 3d numpy array, or None if it can't be stored as one.
+    Floats are left alone so that results match the per-cell functions
+    exactly.
+    """
+    if len(grid) == 0 or len(grid[0]) == 0 or type(grid[0][0]) is not list:
+        return None
+
+    depth = len(grid[0][0])
+    for row in grid:
+        for cell in row:
+            if type(cell) is not list or len(cell) != depth:
+                return None
+
+    values = np.array(grid)
+    if depth == 0 or values.ndim != 3 or values.dtype.kind not in "iuU":
+        return None
+    return values
 
 
 def slice_3d_grid(grid, n):
@@ -115,6 +173,9 @@ def flatten_array(grid):
     Takes a multi-dimensional array and returns a 1 dimensional array with the
     same contents.
     """
+    if isinstance(grid, np.ndarray):
+        return grid.ravel().tolist()
+
     grid = [grid[i][j] for i in range(len(grid)) for j in range(len(grid[i]))]
     while type(grid[0]) is list:
         grid = flatten_array(grid)
@@ -178,6 +239,29 @@ def dist(p1, p2):
     return sqrt((p1[0]-p2[0])**2 + (p1[1]-p2[1])**2)
 
 
+def map_in_pool(func, items, workers=None):
+    """
+    Calls func on each item in items and yields the results in the same
+    order as items. If workers is greater than 1, items are handed out to a
+    pool of that many processes so that they can be handled concurrently
+    (func and the items must then be picklable).
+    """
+    if workers is None or workers <= 1 or len(items) < 2:
+        for item in items:
+            yield func(item)
+        return
+
+    workers = min(workers, len(items))
+    chunksize = max(1, len(items) // (workers * 4))
+    pool = multiprocessing.Pool(workers)
+    try:
+        for result in pool.imap(func, items, chunksize):
+            yield result
+    finally:
+        pool.terminate()
+        pool.join()
+
+
 def function_with_args(func, *args):
     """
     Returns a function that calls a function with the specified arguments.
@@ -219,12 +303,21 @@ def phenotype_to_res_set(phenotype, resources):
     Converts a binary string to a set containing the resources indicated by
     the bits in the string.
 
-    Inputs: phenotype - a binary string
+    Inputs: phenotype - a binary string or an integer bitmask
             resources - a list of string indicating which resources correspond
                         to which indices of the phenotype
 
     returns: A set of strings indicating resources
     """
+    if not isinstance(phenotype, str):
+        # The first resource corresponds to the leftmost of len(resources)
+        # binary digits
+        phenotype = int(phenotype)
+        assert(phenotype >> len(resources) == 0)
+        n = len(resources)
+        return set([resources[i] for i in range(n)
+                    if (phenotype >> (n - 1 - i)) & 1])
+
     assert(phenotype[0:2] == "0b")
     phenotype = phenotype[2:]
     # Fill in leading zeroes
@@ -241,7 +334,7 @@ def phenotype_to_res_set(phenotype, resources):
     return res_set
 
 
-def res_set_to_phenotype(res_set, full_list):
+def res_set_to_phenotype(res_set, full_list, as_int=False):
     """
     Converts a set of strings indicating resources to a binary string where
     the positions of 1s indicate which resources are present.
@@ -250,10 +343,22 @@ def res_set_to_phenotype(res_set, full_list):
             full_list - a list of strings indicating all resources which could
                         could be present, and the order in which they should
                         map to bits in the phenotype
-    returns: A binary string
+            as_int - if True, return the phenotype as an integer bitmask
+                     rather than a string (default: False)
+    returns: A binary string (or integer)
     """
 
     full_list = list(full_list)
+
+    if as_int:
+        n = len(full_list)
+        phenotype = 0
+        for i in range(n):
+            if full_list[i] in res_set:
+                phenotype |= 1 << (n - 1 - i)
+        assert(popcount(phenotype) == len(res_set))
+        return phenotype
+
     phenotype = len(full_list) * ["0"]
 
     for i in range(len(full_list)):
@@ -290,15 +395,12 @@ def n_tasks(dec_num):
     Takes a decimal number as input and returns the number of ones in the
     binary representation.
     This translates to the number of tasks being done by an organism with a
-    phenotype represented as a decimal number.
+    phenotype represented as a decimal number. Binary strings and numpy
+    arrays of phenotypes are also accepted.
     """
-    bitstring = ""
-    try:
-        bitstring = dec_num[2:]
-    except:
-        bitstring = bin(int(dec_num))[2:]  # cut off 0b
-    # print bin(int(dec_num)), bitstring
-    return bitstring.count("1")
+    if isinstance(dec_num, str):
+        return dec_num[2:].count("1")
+    return popcount(dec_num)
 
 
 def convert_to_pysal(data):
@@ -312,15 +414,96 @@ def convert_to_pysal(data):
     return w, data
 
 
+# ~~~~~~~~~~~~~~~~~~~~~~~~~PHENOTYPE BITMASKS~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~#
+# Phenotypes can be stored as integers (bit i set means task i is done)
+# rather than "0b..." strings. -1 marks cells with no organism in them.
+
+# Number of ones in the binary representation of each possible byte
+_POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)],
+                           dtype=np.uint8)
+
+
+def popcount(values):
+    """
+    Takes an integer phenotype or a numpy array of them and returns the
+    number of ones in the binary representation of each (i.e. the number of
+    tasks being done). As with bin(), negative numbers are counted by their
+    absolute value.
+    """
+    if not isinstance(values, np.ndarray):
+        return bin(abs(int(values))).count("1")
+
+    values = np.ascontiguousarray(np.abs(values.astype(np.int64)))
+    counts = _POPCOUNT_TABLE[values.view(np.uint8)]
+    return counts.reshape(values.shape + (8,)).sum(axis=-1)
+
+
+def bit_length(values):
+    """
+    Vectorized int.bit_length(): takes a numpy array of integer phenotypes
+    and returns an array containing the number of binary digits needed to
+    represent the absolute value of each element.
+    """
+    remaining = np.abs(values)
+    lengths = np.zeros(remaining.shape, dtype=np.int64)
+    while remaining.any():
+        lengths += remaining > 0
+        remaining = remaining >> 1
+    return lengths
+
+
+def bit_is_set(values, bit):
+    """
+    Takes an integer phenotype or a numpy array of them and returns whether
+    the given bit (i.e. task number, counting from the least significant
+    bit) is set in each. Empty cells (negative values) never have a bit set.
+    """
+    return (values >= 0) & (((values >> bit) & 1) == 1)
+
+
+def phenotype_dtype(values):
+    """
+    Returns the smallest signed numpy integer type that can hold every
+    phenotype in values (an array of integers). Signed types are used so
+    that the -1 placeholder for empty cells can be stored. A world with 9
+    tasks, for instance, needs two bytes per cell.
+    """
+    largest = int(np.abs(values).max()) if np.size(values) else 0
+    for dtype in [np.int8, np.int16, np.int32]:
+        if largest <= np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+def pack_phenotypes(grid):
+    """
+    Converts a 2d or 3d grid of phenotypes stored as binary strings (as
+    returned by load_grid_data) into a numpy array of integers with the
+    smallest type that can hold them (see phenotype_dtype).
+    """
+    values = _phenotype_array(grid)[0]
+    return values.astype(phenotype_dtype(values))
+
+
+def unpack_phenotypes(values):
+    """
+    Converts a numpy array of integer phenotypes back to nested lists of
+    binary strings, as returned by load_grid_data.
+    """
+    return np.vectorize(bin, otypes=[object])(values).tolist()
+
+
 # ~~~~~~~~~~~~~~~~~~~~~~AGGREGATION FUNCTIONS~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~#
 # Provided for easy use with agg_grid
 
 def mode(ls):
     """
     Takes a list as an argument and returns the mode of (most common item in)
-    that list.
+    that list. Ties are broken in favor of the smallest value.
     """
-    return max(set(ls), key=ls.count)
+    counts = Counter(ls)
+    most = max(counts.values())
+    return min(val for val in counts if counts[val] == most)
 
 
 def mean(ls):
@@ -332,10 +515,21 @@ def mean(ls):
 
 def median(ls):
     """
-    Takes a list and returns the median.
+    Takes a list and returns the median (for lists of even length, the
+    larger of the two middle values).
     """
-    ls = sorted(ls)
-    return ls[int(floor(len(ls)/2.0))]
+    middle = int(floor(len(ls)/2.0))
+    if len(ls) >= _SELECTION_MIN_LENGTH:
+        values = np.asarray(ls)
+        if values.dtype.kind in "iuf":
+            # Partial sort: only the middle element needs to end up in place
+            return ls[np.argpartition(values, middle)[middle]]
+    return sorted(ls)[middle]
+
+
+# Below this length, sorting a list is faster than converting it for
+# np.argpartition
+_SELECTION_MIN_LENGTH = 1000
 
 
 def string_avg(strings, binary=True):
@@ -343,9 +537,21 @@ def string_avg(strings, binary=True):
     Takes a list of strings of equal length and returns a string containing
     the most common value from each index in the string.
 
+    If the list contains integer phenotypes instead of strings, returns the
+    integer in which each bit is set if it is set in more than half of them.
+
     Optional argument: binary - a boolean indicating whether or not to treat
     strings as binary numbers (fill in leading zeros if lengths differ).
+    Binary numbers written with a "0b" prefix (as Avida writes phenotypes)
+    are averaged with bitwise_majority().
     """
+    if not isinstance(strings[0], str) or \
+            (binary and all(s.startswith(("0b", "-0b")) for s in strings)):
+        try:
+            return bitwise_majority(strings)
+        except ValueError:
+            # These strings aren't binary numbers after all
+            pass
 
     if binary:  # Assume this is a binary number and fill leading zeros
         strings = deepcopy(strings)
@@ -366,14 +572,358 @@ def string_avg(strings, binary=True):
     return avg
 
 
-def get_world_dimensions(gridfile, delim=" "):
+def mode_array(values):
+    """
+    Batched version of mode(): takes a 3d array (or nested lists) and returns
+    a 2d array containing the most common value along the third axis at each
+    location. Ties are broken in favor of the smallest value.
+
+    Small integers (e.g. phenotypes or task counts) are counted directly;
+    anything else is sorted.
+    """
+    values = np.asarray(values)
+    if values.dtype.kind in "iu" and values.size:
+        low = int(values.min())
+        n_values = int(values.max()) - low + 1
+        cells = values.shape[0] * values.shape[1]
+        if cells * n_values <= _MAX_MODE_COUNTS:
+            return _count_mode(values, low, n_values)
+    return _sort_mode(values)
+
+
+# Largest number of counters that mode_array will allocate
+_MAX_MODE_COUNTS = 2 ** 24
+
+
+def _count_mode(values, low, n_values):
+    """
+    mode_array for integers between low and low + n_values - 1.
+    """
+    rows, cols, depth = values.shape
+    cells = np.arange(rows * cols).repeat(depth)
+    counts = np.bincount(cells * n_values + (values.ravel() - low),
+                         minlength=rows * cols * n_values)
+    # argmax returns the first maximum, which is the smallest tied value
+    best = counts.reshape(rows * cols, n_values).argmax(axis=1)
+    return (best + low).astype(values.dtype).reshape(rows, cols)
+
+
+def _sort_mode(values):
+    """
+    mode_array for anything that can be sorted.
+    """
+    values = np.sort(values, axis=2)
+    index = np.arange(values.shape[2])
+
+    # Every position gets the index at which its run of equal values started
+    new_run = np.ones(values.shape, dtype=bool)
+    new_run[:, :, 1:] = values[:, :, 1:] != values[:, :, :-1]
+    starts = np.maximum.accumulate(np.where(new_run, index, 0), axis=2)
+
+    # The first position to reach the longest run length belongs to the
+    # smallest of the most common values
+    best = np.argmax(index - starts, axis=2)
+    return np.take_along_axis(values, best[:, :, np.newaxis], axis=2)[:, :, 0]
+
+
+def _mean_along_axis(values):
+    """
+    Returns the mean along the third axis of a 3d array.
+    """
+    if values.dtype.kind in "iu":
+        # Sum exactly before dividing, as mean() does
+        return values.sum(axis=2, dtype=np.int64) / float(values.shape[2])
+    return values.mean(axis=2)
+
+
+def median_array(values):
+    """
+    Batched version of median(): takes a 3d array (or nested lists) and
+    returns a 2d array containing the median along the third axis at each
+    location.
+    """
+    values = np.asarray(values)
+    middle = int(floor(values.shape[2]/2.0))
+    if values.dtype.kind in "iuf":
+        return np.partition(values, middle, axis=2)[:, :, middle]
+    return np.sort(values, axis=2)[:, :, middle]
+
+
+def bitwise_majority(phenotypes):
+    """
+    Takes an array (or nested lists) of phenotypes, either binary strings or
+    integers, and takes a majority vote on each bit along the last axis. A
+    3d grid of snapshots, for instance, yields a 2d grid of phenotypes,
+    while a flat list yields a single phenotype.
+
+    A bit is set in the result if it is set in more than half of the
+    phenotypes. If more than half of the phenotypes are empty (negative),
+    the result is empty too (-1). Otherwise, negative values contribute the
+    digits of their absolute value, as they do in bin().
+
+    Strings are returned for strings, padded with leading zeros to the
+    length of the longest one, and integers for integers.
+    """
+    values, digits = _phenotype_array(phenotypes)
+    magnitudes = np.abs(values).astype(phenotype_dtype(values))
+
+    counts = []
+    if values.size:
+        for b in range(int(bit_length(magnitudes.max()))):
+            counts.append(((magnitudes >> b) & 1).sum(axis=-1))
+    result = _majority_phenotypes(counts, values.shape[-1],
+                                  values.shape[:-1],
+                                  (values < 0).sum(axis=-1))
+
+    if digits is not None:
+        result = _phenotype_strings(result, digits.max(axis=-1))
+    if result.ndim == 0:
+        return result.item()
+    return result
+
+
+# Aggregation functions that agg_grid can compute for a whole grid at once
+def _string_avg_along_axis(values):
+    """
+    Returns bitwise_majority(values), or None if values holds strings that
+    aren't all "0b"-prefixed binary numbers, which string_avg averages
+    digit by digit instead.
+    """
+    if values.dtype.kind == "U":
+        prefixed = np.char.startswith(values, "0b") | \
+            np.char.startswith(values, "-0b")
+        if not prefixed.all():
+            return None
+    elif values.dtype.kind == "O":
+        if not all(str(val).startswith(("0b", "-0b"))
+                   for val in values.flat):
+            return None
+    return bitwise_majority(values)
+
+
+_AXIS_AGGREGATIONS = {mode: mode_array, mean: _mean_along_axis,
+                      median: median_array,
+                      string_avg: _string_avg_along_axis}
+
+
+# ~~~~~~~~~~~~~~~~~~~~STREAMING AGGREGATION FUNCTIONS~~~~~~~~~~~~~~~~~~~~~~~~#
+# Take an iterable of 2d grids (e.g. from iter_grid_data) instead of a 3d
+# grid, and fold them in one at a time so only one snapshot is in memory.
+# Results are numpy arrays if the snapshots were arrays and nested lists
+# otherwise.
+
+def stream_mode(snapshots):
+    """
+    Streaming version of agg_grid(grid, mode). Returns the most common value
+    at each location across the snapshots, keeping one count per distinct
+    value rather than every snapshot. Ties are broken in favor of the
+    smallest value.
+    """
+    counts = {}
+    as_array = None
+
+    for snapshot in snapshots:
+        as_array = isinstance(snapshot, np.ndarray)
+        snapshot = np.asarray(snapshot)
+        for val in np.unique(snapshot):
+            if val in counts:
+                counts[val] += snapshot == val
+            else:
+                counts[val] = (snapshot == val).astype(np.int64)
+
+    if as_array is None:
+        raise ValueError("No snapshots to aggregate")
+
+    values = sorted(counts)
+    # argmax returns the first maximum, which is the smallest tied value
+    best = np.argmax([counts[val] for val in values], axis=0)
+    return _stream_result(np.array(values)[best], as_array)
+
+
+def stream_mean(snapshots):
+    """
+    Streaming version of agg_grid(grid, mean). Returns the mean value at each
+    location across the snapshots.
+    """
+    total = None
+    n = 0
+
+    for snapshot in snapshots:
+        as_array = isinstance(snapshot, np.ndarray)
+        if total is None:
+            total = np.zeros(np.shape(snapshot))
+        total += snapshot
+        n += 1
+
+    if total is None:
+        raise ValueError("No snapshots to aggregate")
+
+    return _stream_result(total / n, as_array)
+
+
+def stream_string_avg(snapshots):
+    """
+    Streaming version of agg_grid(grid, string_avg). Takes snapshots of
+    phenotypes (either binary strings or integers) and returns the majority
+    phenotype at each location, built up from per-bit counts.
+
+    A bit is set in the result if it is set in more than half of the
+    snapshots, and cells that are empty (negative) in more than half of the
+    snapshots are empty in the result. Otherwise, negative values contribute
+    the digits of their absolute value, as they do in bin(). Phenotypes are
+    returned as zero-padded binary strings if the snapshots contained
+    strings, and as integers otherwise.
+    """
+    counts = []
+    widths = None
+    empty = 0
+    n = 0
+
+    for snapshot in snapshots:
+        as_array = isinstance(snapshot, np.ndarray)
+        values, digits = _phenotype_array(snapshot)
+        strings = digits is not None
+        if not strings:
+            digits = np.maximum(bit_length(values), 1) + (values < 0)
+        if widths is None:
+            widths = digits
+        n += 1
+
+        _add_bit_counts(values, counts)
+        empty = empty + (values < 0)
+        widths = np.maximum(widths, digits)
+
+    if widths is None:
+        raise ValueError("No snapshots to aggregate")
+
+    result = _majority_phenotypes(counts, n, widths.shape, empty)
+    if strings:
+        result = _phenotype_strings(result, widths)
+    return _stream_result(result, as_array)
+
+
+def _stream_result(result, as_array):
+    """
+    Returns result as a numpy array if as_array is True, and as nested lists
+    otherwise.
+    """
+    if as_array:
+        return result
+    return result.tolist()
+
+
+def _phenotype_array(phenotypes):
+    """
+    Converts a grid of phenotypes (binary strings or integers) to a numpy
+    array of integers. If the phenotypes were strings, also returns an array
+    of the number of characters after the "0b" in each one (None otherwise).
+    """
+    if isinstance(phenotypes, np.ndarray):
+        if phenotypes.dtype.kind not in "USO":
+            return phenotypes.astype(np.int64), None
+        shape = phenotypes.shape
+        flat = phenotypes.ravel().tolist()
+    else:
+        # Walk the nested lists directly; converting lots of strings to a
+        # numpy array first is slower than the conversion itself
+        shape = []
+        first = phenotypes
+        while isinstance(first, (list, tuple)):
+            shape.append(len(first))
+            first = first[0] if len(first) else None
+        if not isinstance(first, str):
+            return np.array(phenotypes, dtype=np.int64), None
+
+        flat = phenotypes
+        for i in range(len(shape) - 1):
+            flat = itertools.chain.from_iterable(flat)
+        flat = list(flat)
+        if len(flat) != np.prod(shape):
+            raise ValueError("Grid of phenotypes is not rectangular")
+
+    # Most phenotypes are repeated many times, so only convert each once
+    values = _BinaryValues()
+    values = np.fromiter(map(values.__getitem__, flat), dtype=np.int64,
+                         count=len(flat))
+    digits = np.fromiter(map(len, flat), dtype=np.int64, count=len(flat))
+    return values.reshape(shape), (digits - 2).reshape(shape)
+
+
+class _BinaryValues(dict):
+    """
+    Dictionary mapping binary strings to the integers they represent,
+    filled in as strings are looked up.
+    """
+    def __missing__(self, string):
+        value = self[string] = int(string, 2)
+        return value
+
+
+def _add_bit_counts(values, counts):
+    """
+    Adds 1 to counts[b] at every location where bit b of the absolute value
+    in values is set. counts is a list of integer arrays (one per bit) and is
+    extended as necessary.
+    """
+    values = np.abs(values)
+    for b in range(int(bit_length(values.max()))):
+        if b == len(counts):
+            counts.append(np.zeros(values.shape, dtype=np.int64))
+        counts[b] += (values >> b) & 1
+
+
+def _majority_phenotypes(counts, n, shape, empty=0):
+    """
+    Takes a list of per-bit counts (as built by _add_bit_counts), the
+    number of phenotypes counted, the shape of the grid, and (optionally)
+    the number of empty phenotypes at each location, and returns an array
+    of integers in which each bit is set if it was set in more than half of
+    the phenotypes. Locations that were empty more than half the time are
+    -1.
+    """
+    result = np.zeros(shape, dtype=np.int64)
+    for b, count in enumerate(counts):
+        result |= (2 * count > n).astype(np.int64) << b
+    result[2 * np.asarray(empty) > n] = -1
+    return result
+
+
+def _phenotype_strings(values, widths):
+    """
+    Converts an array of integers to an array of binary strings, padding
+    each non-negative one with leading zeros to the number of digits in
+    widths. Negative values (empty cells) become "-0b1".
+    """
+    strings = ["-0b1" if val < 0 else
+               "0b" + format(int(val), "0" + str(int(width)) + "b")
+               for val, width in zip(values.ravel(), widths.ravel())]
+    return np.array(strings).reshape(values.shape)
+
+
+def get_world_dimensions(gridfile, delim=" ", cache_dir=None):
     """
     This function takes the name of a file in grid_task format and returns
-    the dimensions of the world it represents.
+    the dimensions of the world it represents. If cache_dir is given and
+    the file has already been cached there by load_grid_data, the
+    dimensions are read from the cache rather than the text file.
     """
+    if cache_dir is not None:
+        for data_type in ["binary", "int", "float"]:
+            grid = load_cached_grid(gridfile, cache_dir, data_type, delim)
+            if grid is not None:
+                return (grid.shape[1], grid.shape[0])
+
     infile = open(gridfile)
     lines = infile.readlines()
     infile.close()
+    return _dimensions_from_lines(lines, delim)
+
+
+def _dimensions_from_lines(lines, delim=" "):
+    """
+    Takes the lines of a file in grid_task format and returns the dimensions
+    of the world it represents.
+    """
     world_x = len(lines[0].strip().split(delim))
     world_y = len(lines)
     return (world_x, world_y)
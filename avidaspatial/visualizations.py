@@ -2,6 +2,7 @@ import random
 import glob
 import re
 import string
+import itertools
 from matplotlib import pyplot as plt
 import matplotlib
 import matplotlib.animation
@@ -123,26 +124,51 @@ def make_movie(phenotypes, **kwargs):
     the appropraite denoms before passing them to this funciton).
 
     Inputs:
-          phenotypes  - a 2d array of numbers or binary strings representing
+          phenotypes  - a 3d array of numbers or binary strings representing
                         the placement of phenotypes across the environment
+                        over time. This can also be an iterator of 2d grids
+                        (such as the one returned by iter_grid_data), in
+                        which case snapshots are read one frame at a time
+                        rather than held in memory.
 
     kwargs:
           denom - an integer indicating how to normalize numbers in the
                   environment and phenotype grids if neccesary.
+          palette - a seaborn palette to color phenotypes with. When
+                    phenotypes is an iterator, the default palette is chosen
+                    based on the first snapshot only.
+          n_frames - when phenotypes is an iterator, the number of snapshots
+                     it will yield (used when saving the animation).
     Outputs:
          Returns a matplotlib animation object.
          Saves animation in the file:
             [environment_file_identifier]_phenotype_overlay.mp4
     """
-    denom, palette = get_kwargs(phenotypes, kwargs)
+    if isinstance(phenotypes, (list, np.ndarray)):
+        denom, palette = get_kwargs(phenotypes, kwargs)
+        frames = len(phenotypes[0][0])
+        stream_args = {}
+
+        def get_frame(n):
+            return slice_3d_grid(phenotypes, n)
+    else:
+        # Peek at the first snapshot to pick colors, then put it back
+        phenotypes = iter(phenotypes)
+        first = next(phenotypes)
+        denom, palette = get_kwargs(first, kwargs)
+        frames = itertools.chain([first], phenotypes)
+        stream_args = {"save_count": kwargs.get("n_frames"),
+                       "cache_frame_data": False}
+
+        def get_frame(phen_grid):
+            return phen_grid
 
     # Create figure to do plotting
     fig = plt.figure(figsize=(20, 20))
 
     # Change colors of circles as appropriate for new time step
-    def animate(n):
-        # print("animating", n)
-        phen_grid = slice_3d_grid(phenotypes, n)
+    def animate(frame):
+        phen_grid = get_frame(frame)
         # print(phen_grid)
         grid = color_grid(phen_grid, palette, denom, False)
         plt.tick_params(labelbottom="off", labeltop="off", labelleft="off",
@@ -154,7 +180,7 @@ def make_movie(phenotypes, **kwargs):
     # Do actual animation
     anim = matplotlib.animation.FuncAnimation(
         fig, animate,
-        frames=len(phenotypes[0][0]), interval=750)
+        frames=frames, interval=750, **stream_args)
 
     anim.save("movie.mov")
     return anim
@@ -426,8 +452,19 @@ def color_array_by_hue_mix(value, palette):
     """
     Figure out the appropriate color for a binary string value by averaging
     the colors corresponding the indices of each one that it contains. Makes
-    for visualizations that intuitively show patch overlap.
+    for visualizations that intuitively show patch overlap. Integer
+    phenotypes are also accepted.
     """
+    if not isinstance(value, str):
+        value = int(value)
+        if value > 0:
+            # Bit i corresponds to palette[i]
+            locs = [i for i in range(value.bit_length()) if value >> i & 1]
+            return _mix_colors([palette[i] for i in locs])
+        if value == 0:
+            return (1, 1, 1) if len(palette[0]) == 3 else (1, 1, 1, 1)
+        return -1
+
     if int(value, 2) > 0:
 
         # Convert bits to list and reverse order to avoid issues with
@@ -442,15 +479,7 @@ def color_array_by_hue_mix(value, palette):
         # print(palette)
         rgb_vals = [palette[i] for i in locs]
 
-        rgb = [0]*len(rgb_vals[0])  # We don't know if it's rgb or rgba
-        for val in rgb_vals:
-            for index in range(len(val)):
-                rgb[index] += val[index]
-
-        for i in range(len(rgb)):
-            rgb[i] /= len(locs)
-
-        return tuple(rgb)
+        return _mix_colors(rgb_vals)
 
     if int(value, 2) == 0:
         return (1, 1, 1) if len(palette[0]) == 3 else (1, 1, 1, 1)
@@ -458,6 +487,21 @@ def color_array_by_hue_mix(value, palette):
     return -1
 
 
+def _mix_colors(rgb_vals):
+    """
+    Averages a list of RGB or RGBA colors.
+    """
+    rgb = [0]*len(rgb_vals[0])  # We don't know if it's rgb or rgba
+    for val in rgb_vals:
+        for index in range(len(val)):
+            rgb[index] += val[index]
+
+    for i in range(len(rgb)):
+        rgb[i] /= len(rgb_vals)
+
+    return tuple(rgb)
+
+
 def color_percentages(file_list, n_tasks=9, file_name="color_percent.png",
                       intensification_factor=1.2):
     """
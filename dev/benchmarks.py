@@ -0,0 +1,696 @@
+# Benchmarks for the performance-sensitive parts of avidaspatial.
+#
+# Run all of them from the root of the repository with:
+#     python dev/benchmarks.py
+# or pick specific ones by name:
+#     python dev/benchmarks.py first_file_reads
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+import avidaspatial
+from avidaspatial import parse_files, utils
+
+
+def best_time(func, repeats=3):
+    """
+    Calls func repeats times and returns the fastest run time in seconds.
+    """
+    best = float("inf")
+    for i in range(repeats):
+        start = time.time()
+        func()
+        best = min(best, time.time() - start)
+    return best
+
+
+def write_grid_file(filename, world_size, n_tasks=9, seed=0):
+    """
+    Writes a random grid_task file with the given dimensions.
+    """
+    random = np.random.RandomState(seed)
+    grid = random.randint(-1, 2**n_tasks, size=(world_size[1],
+                                                world_size[0]))
+    with open(filename, "w") as outfile:
+        for row in grid:
+            outfile.write(" ".join(str(val) for val in row) + " \n")
+
+
+class CountingOpen(object):
+    """
+    Stand-in for open() that counts how many bytes are read through the
+    files it opens.
+    """
+    def __init__(self):
+        self.bytes_read = 0
+        self.opens = 0
+
+    def __call__(self, *args, **kwargs):
+        self.opens += 1
+        infile = open(*args, **kwargs)
+        counter = self
+
+        class CountingFile(object):
+            def read(self, *args):
+                text = infile.read(*args)
+                counter.bytes_read += len(text)
+                return text
+
+            def readlines(self):
+                lines = infile.readlines()
+                counter.bytes_read += sum(len(line) for line in lines)
+                return lines
+
+            def close(self):
+                infile.close()
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *args):
+                infile.close()
+
+        return CountingFile()
+
+
+def count_reads(func):
+    """
+    Calls func while counting the file reads done by parse_files and utils.
+    Returns (number of opens, bytes read).
+    """
+    counter = CountingOpen()
+    parse_files.open = utils.open = counter
+    try:
+        func()
+    finally:
+        del parse_files.open
+        del utils.open
+    return counter.opens, counter.bytes_read
+
+
+def bench_first_file_reads(world_size=(400, 400)):
+    """
+    Compares probing the first file with get_world_dimensions before loading
+    it (as load_grid_data used to) with the single-pass reader and with an
+    explicitly given world_size.
+    """
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        grid_file = os.path.join(tmp_dir, "grid_task.100.dat")
+        write_grid_file(grid_file, world_size)
+
+        def probe_then_read():
+            dims = avidaspatial.get_world_dimensions(grid_file)
+            avidaspatial.load_grid_data(grid_file, world_size=dims)
+
+        cases = [("probe + read", probe_then_read),
+                 ("single pass",
+                  lambda: avidaspatial.load_grid_data(grid_file)),
+                 ("world_size given",
+                  lambda: avidaspatial.load_grid_data(
+                      grid_file, world_size=world_size))]
+
+        print("First-file I/O on a %dx%d world (%d bytes on disk)" %
+              (world_size[0], world_size[1], os.path.getsize(grid_file)))
+        for name, func in cases:
+            opens, bytes_read = count_reads(func)
+            print("  %-17s %d open(s), %10d bytes read, %.3f s" %
+                  (name, opens, bytes_read, best_time(func)))
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def bench_mode_median(world_size=(60, 60), n_snapshots=(10, 100, 1000)):
+    """
+    Compares the original sort- and count-based mode and median with the
+    current per-list functions and their batched array versions, for
+    different numbers of snapshots per cell.
+    """
+    def old_mode(ls):
+        return max(set(ls), key=ls.count)
+
+    def old_median(ls):
+        ls = sorted(ls)
+        return ls[int(np.floor(len(ls)/2.0))]
+
+    random = np.random.RandomState(0)
+    print("Mode and median of a %dx%d world" % world_size)
+    for depth in n_snapshots:
+        values = random.randint(-1, 2**9, size=(world_size[1],
+                                                world_size[0], depth))
+        grid = values.tolist()
+        cases = [("old mode", lambda: [[old_mode(c) for c in row]
+                                       for row in grid]),
+                 ("mode", lambda: [[utils.mode(c) for c in row]
+                                   for row in grid]),
+                 ("mode_array", lambda: utils.mode_array(values)),
+                 ("old median", lambda: [[old_median(c) for c in row]
+                                         for row in grid]),
+                 ("median", lambda: [[utils.median(c) for c in row]
+                                     for row in grid]),
+                 ("median_array", lambda: utils.median_array(values))]
+
+        print("  %d snapshots per cell" % depth)
+        for name, func in cases:
+            repeats = 1 if name == "old mode" and depth > 100 else 3
+            print("    %-13s %.3f s" % (name, best_time(func, repeats)))
+
+
+def bench_string_avg(world_size=(60, 60), depth=1000):
+    """
+    Compares the original per-cell string_avg with bitwise_majority over a
+    whole grid of binary strings and of packed integer phenotypes.
+    """
+    def old_string_avg(strings):
+        strings = [s for s in strings]
+        longest = len(max(strings, key=len))
+        for i in range(len(strings)):
+            while len(strings[i]) < longest:
+                split_string = strings[i].split("b")
+                strings[i] = "0b0" + split_string[1]
+
+        avg = ""
+        for i in (range(len(strings[0]))):
+            opts = []
+            for s in strings:
+                opts.append(s[i])
+            avg += max(set(opts), key=opts.count)
+        return avg
+
+    random = np.random.RandomState(0)
+    values = random.randint(0, 2**9, size=(world_size[1], world_size[0],
+                                            depth))
+    strings = utils.unpack_phenotypes(values)
+    packed = values.astype(utils.phenotype_dtype(values))
+
+    cases = [("old string_avg", lambda: [[old_string_avg(c) for c in row]
+                                         for row in strings]),
+             ("strings", lambda: utils.bitwise_majority(strings)),
+             ("packed", lambda: utils.bitwise_majority(packed))]
+
+    print("Bitwise majority of a %dx%d world with %d snapshots per cell" %
+          (world_size[0], world_size[1], depth))
+    for name, func in cases:
+        print("  %-15s %.3f s" % (name, best_time(func, 1)))
+
+
+def write_gradient_environment(filename, world_size, n_patches,
+                               radius=10, seed=0):
+    """
+    Writes an environment file containing n_patches randomly placed
+    GRADIENT_RESOURCE circles (and a reaction for each of 9 tasks).
+    """
+    random = np.random.RandomState(seed)
+    tasks = ["not", "nand", "and", "orn", "or", "andn", "nor", "xor", "equ"]
+    with open(filename, "w") as outfile:
+        for i in range(n_patches):
+            outfile.write("GRADIENT_RESOURCE res%s%d:height=%d:plateau=1:"
+                          "spread=0:common=1:updatestep=1000000:peakx=%d:"
+                          "peaky=%d:plateau_inflow=1:initial=1\n" %
+                          (tasks[i % 9].upper(), i, radius,
+                           random.randint(world_size[0]),
+                           random.randint(world_size[1])))
+        for task in tasks:
+            outfile.write("REACTION %s %s process:resource=res%s\n" %
+                          (task.upper(), task, task.upper()))
+
+
+def bench_gradient_parsing(world_size=(256, 256), n_patches=400,
+                           n_old_patches=10):
+    """
+    Compares the original full-world scan for each GRADIENT_RESOURCE (timed
+    on the first n_old_patches only, since it is slow) with the bounding-box
+    rasterization used by parse_environment_file.
+    """
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        env_file = os.path.join(tmp_dir, "environment.cfg")
+        write_gradient_environment(env_file, world_size, n_patches)
+        with open(env_file) as infile:
+            lines = [line for line in infile
+                     if line.startswith("GRADIENT_RESOURCE")]
+
+        def old_parse(line):
+            sline = [el.strip() for el in line[18:].split(":")]
+            for item in sline:
+                if item.startswith("height"):
+                    radius = int(item.split("=")[1])
+                elif item.startswith("peakx"):
+                    x = int(item.split("=")[1])
+                elif item.startswith("peaky"):
+                    y = int(item.split("=")[1])
+            cells = []
+            for i in range(world_size[0]):
+                for j in range(world_size[1]):
+                    if (utils.dist((i, j), (x, y))) <= radius-1:
+                        cells.append((i, j))
+            return cells
+
+        old_time = best_time(lambda: [old_parse(line) for line in
+                                      lines[:n_old_patches]], 1)
+        new_time = best_time(lambda: avidaspatial.parse_environment_file(
+            env_file, world_size))
+        toroidal_time = best_time(lambda: avidaspatial.parse_environment_file(
+            env_file, world_size, toroidal=True))
+
+        print("Parsing %d gradient patches on a %dx%d world" %
+              (n_patches, world_size[0], world_size[1]))
+        print("  %-15s %.3f s (extrapolated from %d patches)" %
+              ("full scan", old_time * n_patches / n_old_patches,
+               n_old_patches))
+        print("  %-15s %.3f s" % ("bounding box", new_time))
+        print("  %-15s %.3f s" % ("toroidal", toroidal_time))
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def bench_environment_batch(world_size=(256, 256), n_files=200,
+                            n_configs=4, n_patches=100):
+    """
+    Parses a sweep of environment files drawn from a few configurations,
+    one file at a time with and without reusing parsed resource specs, and
+    with parse_environment_batch.
+    """
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        names = []
+        for i in range(n_files):
+            names.append(os.path.join(tmp_dir, "environment%d.cfg" % i))
+            write_gradient_environment(names[-1], world_size, n_patches,
+                                       seed=i % n_configs)
+
+        def without_memo():
+            for name in names:
+                parse_files._RESOURCE_SPECS.clear()
+                avidaspatial.parse_environment_file(name, world_size)
+
+        def with_memo():
+            parse_files._RESOURCE_SPECS.clear()
+            for name in names:
+                avidaspatial.parse_environment_file(name, world_size)
+
+        def batch(workers):
+            parse_files._RESOURCE_SPECS.clear()
+            avidaspatial.parse_environment_batch(names, world_size,
+                                                 workers=workers)
+
+        cases = [("no reuse", without_memo), ("reuse", with_memo),
+                 ("batch", lambda: batch(None)),
+                 ("batch, 4 workers", lambda: batch(4))]
+
+        print("Parsing %d environment files (%d configurations of %d "
+              "patches) on a %dx%d world" % (n_files, n_configs, n_patches,
+                                             world_size[0], world_size[1]))
+        for name, func in cases:
+            print("  %-17s %.3f s" % (name, best_time(func, 1)))
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def bench_environment_entropy(world_size=(60, 60), n_files=1000,
+                              n_configs=10, n_patches=20):
+    """
+    Compares computing calc_environment_entropy for a sweep of environments
+    from grids of resource sets (which need a frozenset for every cell) with
+    computing it from the niche ids in the summaries returned by
+    parse_environment_batch.
+    """
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        names = []
+        for i in range(n_files):
+            names.append(os.path.join(tmp_dir, "environment%d.cfg" % i))
+            write_gradient_environment(names[-1], world_size, n_patches,
+                                       seed=i % n_configs)
+
+        index = avidaspatial.parse_environment_batch(names, world_size)
+        grids = [[[set(summary.niches[i]) for i in row]
+                  for row in summary.niche_ids.tolist()]
+                 for summary in index.values()]
+
+        def from_sets():
+            for grid in grids:
+                avidaspatial.calc_environment_entropy(grid, world_size)
+
+        def from_ids():
+            for summary in index.values():
+                avidaspatial.calc_environment_entropy(summary, world_size)
+
+        print("Environment entropy of %d %dx%d environments" %
+              (n_files, world_size[0], world_size[1]))
+        print("  %-10s %.3f s" % ("sets", best_time(from_sets, 1)))
+        print("  %-10s %.3f s" % ("niche ids", best_time(from_ids, 1)))
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def bench_diversity_map(world_size=(200, 200), n_values=50):
+    """
+    Compares the original per-cell diversity map (a neighbor list and a
+    Counter for every cell) with diversity_raster.
+    """
+    from collections import Counter
+    from avidaspatial import patch_analysis, landscape_stats
+
+    def old_diversity_map(world, neighbor_func):
+        world_x = len(world[0])
+        world_y = len(world)
+        data = utils.initialize_grid((world_x, world_y), -1)
+        for y in range(world_y):
+            for x in range(world_x):
+                local_vals = Counter()
+                neighbors = neighbor_func([x, y], (world_x, world_y))
+                neighbors.append([x, y])
+                for n in neighbors:
+                    local_vals[world[n[1]][n[0]]] += 1
+                data[y][x] = landscape_stats.entropy(dict(local_vals))
+        return data
+
+    random = np.random.RandomState(0)
+    world = random.randint(n_values, size=(world_size[1],
+                                           world_size[0])).tolist()
+
+    cases = [("old", lambda: old_diversity_map(
+                world, patch_analysis.get_moore_neighbors_toroidal)),
+             ("moore", lambda: avidaspatial.diversity_raster(world)),
+             ("moore, radius 3", lambda: avidaspatial.diversity_raster(
+                 world, radius=3)),
+             ("rook", lambda: avidaspatial.diversity_raster(world, "rook"))]
+
+    print("Diversity map of a %dx%d world with %d values" %
+          (world_size[0], world_size[1], n_values))
+    for name, func in cases:
+        print("  %-16s %.3f s" % (name, best_time(func, 1)))
+
+
+def bench_spatial_weights(world_size=(100, 100), n_values=50):
+    """
+    Compares the original per-cell weighted diversity map (looking up each
+    cell's neighbors and weights in the W object) with the sparse matrix
+    product in diversity_raster.
+    """
+    from avidaspatial import landscape_stats
+
+    def old_weighted_map(world, weights):
+        world_x = len(world[0])
+        world_y = len(world)
+        values, categories = np.unique(world, return_inverse=True)
+        categories = categories.reshape(world_y, world_x)
+        counts = np.zeros((world_y, world_x, len(values)))
+        for y in range(world_y):
+            for x in range(world_x):
+                neighbors = weights.neighbors[world_x*y + x]
+                counts[y, x, categories[y, x]] += 1
+                for i, n in enumerate(neighbors):
+                    counts[y, x, categories[n // world_x, n % world_x]] \
+                        += weights.weights[world_x*y + x][i]
+        return landscape_stats.entropy_array(counts)
+
+    random = np.random.RandomState(0)
+    world = random.randint(n_values, size=(world_size[1],
+                                           world_size[0])).tolist()
+    weights = avidaspatial.make_toroidal_weights(world_size[1],
+                                                 world_size[0], rook=False)
+    matrix = avidaspatial.spatial_weights_matrix(
+        weights, world_size[0] * world_size[1])
+
+    cases = [("old", lambda: old_weighted_map(world, weights)),
+             ("W object", lambda: avidaspatial.diversity_raster(
+                 world, weights=weights)),
+             ("sparse matrix", lambda: avidaspatial.diversity_raster(
+                 world, weights=matrix))]
+
+    print("Weighted diversity map of a %dx%d world with %d values" %
+          (world_size[0], world_size[1], n_values))
+    for name, func in cases:
+        print("  %-16s %.3f s" % (name, best_time(func, 1)))
+
+
+def bench_diversity_cube(world_size=(60, 60), n_times=50, n_values=20):
+    """
+    Compares calling diversity_map on each time point (after slicing it out
+    with slice_3d_grid) with a single call to diversity_cube.
+    """
+    random = np.random.RandomState(0)
+    data = random.randint(n_values, size=(world_size[1], world_size[0],
+                                          n_times)).tolist()
+
+    def per_snapshot():
+        return [avidaspatial.diversity_map(utils.slice_3d_grid(data, t))
+                for t in range(n_times)]
+
+    cases = [("per snapshot", per_snapshot),
+             ("cube", lambda: avidaspatial.diversity_cube(data)),
+             ("cube, 2 workers", lambda: avidaspatial.diversity_cube(
+                 data, workers=2))]
+
+    print("Diversity maps of %d time points of a %dx%d world" %
+          (n_times, world_size[0], world_size[1]))
+    for name, func in cases:
+        print("  %-16s %.3f s" % (name, best_time(func, 1)))
+
+
+def bench_patch_metrics(world_size=(60, 60), n_patches=20):
+    """
+    Compares the patch metrics calling their neighbor functions for every
+    cell (which is what happens for any neighbor function without a
+    neighbor table) with the neighbor table versions.
+    """
+    from avidaspatial import patch_analysis
+
+    random = np.random.RandomState(0)
+    patches = []
+    for i in range(n_patches):
+        mask = random.rand(world_size[1], world_size[0]) < 0.8
+        patches.append([[x, y] for y in range(world_size[1])
+                        for x in range(world_size[0]) if mask[y][x]])
+
+    def metrics(rook, moore):
+        for patch in patches:
+            patch_analysis.perimeter(patch, world_size, rook)
+            patch_analysis.get_edge_locations(patch, world_size, moore)
+            patch_analysis.get_core_areas(patch, 1, world_size, moore)
+
+    def wrap(func):
+        return lambda cell, size: func(cell, size)
+
+    rook = patch_analysis.get_rook_neighbors_toroidal
+    moore = patch_analysis.get_moore_neighbors_toroidal
+    cases = [("neighbor funcs", lambda: metrics(wrap(rook), wrap(moore))),
+             ("neighbor tables", lambda: metrics(rook, moore))]
+
+    print("Perimeter, edges, and core areas of %d patches in a %dx%d world" %
+          (n_patches, world_size[0], world_size[1]))
+    for name, func in cases:
+        print("  %-16s %.3f s" % (name, best_time(func, 1)))
+
+    # A small patch in a large world shouldn't pay for the size of the world
+    large_world = (512, 512)
+    patch = [[x, y] for x in range(10, 14) for y in range(10, 13)]
+    patch.append([20, 20])
+
+    def small_patch(moore):
+        for i in range(100):
+            patch_analysis.traverse_core(patch, large_world, moore)
+            patch_analysis.get_core_areas(patch, 1, large_world, moore)
+
+    cases = [("neighbor funcs", lambda: small_patch(wrap(moore))),
+             ("neighbor tables", lambda: small_patch(moore))]
+
+    # The neighbor table for the world is built on the first run, and then
+    # reused, so take the best of a few runs
+    print("Core areas of a %d cell patch in a %dx%d world, 100 times" %
+          (len(patch), large_world[0], large_world[1]))
+    for name, func in cases:
+        print("  %-16s %.3f s" % (name, best_time(func, 3)))
+
+
+def bench_label_patches(world_size=(200, 200), n_values=4):
+    """
+    Compares finding the patches of each value in a world by calling
+    traverse_core on its cells with labelling them all with label_patches.
+    """
+    from avidaspatial import patch_analysis
+
+    random = np.random.RandomState(0)
+    world = random.randint(n_values, size=(world_size[1], world_size[0]))
+
+    def per_value():
+        patches = []
+        for value in range(n_values):
+            cells = [[x, y] for y in range(world_size[1])
+                     for x in range(world_size[0]) if world[y][x] == value]
+            patches += patch_analysis.traverse_core(cells, world_size)
+        return patches
+
+    cases = [("traverse_core", per_value),
+             ("label_patches", lambda: patch_analysis.label_patches(world))]
+
+    print("Patches of %d values in a %dx%d world" %
+          (n_values, world_size[0], world_size[1]))
+    for name, func in cases:
+        print("  %-16s %.3f s" % (name, best_time(func, 1)))
+
+
+def bench_patch_metrics_table(world_size=(100, 100), n_values=4):
+    """
+    Compares calling each patch metric on the cells of every patch in a
+    world with patch_metrics.
+    """
+    from avidaspatial import patch_analysis as pa
+
+    random = np.random.RandomState(0)
+    world = random.randint(n_values, size=(world_size[1], world_size[0]))
+    labels, patches = pa.label_patches(world)
+    cells = [[[int(cell % world_size[0]), int(cell // world_size[0])]
+              for cell in patch] for patch in patches]
+
+    def per_patch():
+        for patch in cells:
+            perim = pa.perimeter(patch, world_size)
+            pa.area(patch)
+            pa.shape_index(patch, perim)
+            pa.fractal_dimension(patch, perim)
+            pa.contiguity_index(patch)
+            pa.radius_of_gyration(patch)
+            pa.related_circumscribing_circle(patch, world_size=world_size)
+
+    cases = [("per patch", per_patch),
+             ("patch_metrics", lambda: pa.patch_metrics(labels))]
+
+    print("Metrics for %d patches in a %dx%d world" %
+          (len(patches), world_size[0], world_size[1]))
+    for name, func in cases:
+        print("  %-16s %.3f s" % (name, best_time(func, 1)))
+
+
+def bench_core_areas(world_size=(60, 60), radius=22, distance=2):
+    """
+    Compares the original core area calculations (the distance from every
+    cell to every edge cell for core_area, and a breadth-first search from
+    every cell for get_core_areas) with the distance transform versions, on
+    a roughly circular patch of about 1500 cells and on a 9 cell patch in a
+    large world.
+    """
+    from avidaspatial import patch_analysis as pa
+
+    def old_core_area(patch, world_size):
+        edge = pa.get_edge_locations(patch, world_size)
+        return sum(1 for cell in patch
+                   if min([utils.toroidal_dist(cell, other, world_size)
+                           for other in edge]) >= distance)
+
+    def old_get_core_areas(patch, world_size):
+        # Without a distance transform, get_core_areas falls back to its
+        # breadth-first search
+        core_cells = pa._core_cells
+        pa._core_cells = lambda *args: None
+        try:
+            return pa.get_core_areas(patch, distance, world_size)
+        finally:
+            pa._core_cells = core_cells
+
+    def compare(patch, world_size, repeats):
+        cases = [("old core_area", old_core_area),
+                 ("core_area", lambda patch, world_size: pa.core_area(
+                     patch, distance, world_size)),
+                 ("old get_core_areas", old_get_core_areas),
+                 ("get_core_areas", lambda patch, world_size:
+                  pa.get_core_areas(patch, distance, world_size))]
+
+        print("Core areas of a %d cell patch in a %dx%d world, %d times" %
+              (len(patch), world_size[0], world_size[1], repeats))
+        for name, func in cases:
+            print("  %-20s %.3f s" % (name, best_time(
+                lambda: [func(patch, world_size) for i in range(repeats)],
+                1)))
+
+    center = (world_size[0] // 2, world_size[1] // 2)
+    compare([[x, y] for x in range(world_size[0])
+             for y in range(world_size[1])
+             if utils.dist((x, y), center) <= radius], world_size, 1)
+
+    # A small patch (crossing the edge) in a large world should only pay
+    # for the size of the patch
+    compare([[x % 512, y] for x in range(-1, 2) for y in range(3)],
+            (512, 512), 100)
+
+
+def bench_circumscribing_circle(world_size=(200, 200), radius=60):
+    """
+    Compares the original related_circumscribing_circle (comparing every
+    pair of convex hull vertices and counting the cells in the circle one
+    at a time) with the rotating calipers and vectorized count, on a
+    roughly circular patch.
+    """
+    from math import ceil, floor, pi, sqrt
+    from scipy.spatial import ConvexHull
+    from avidaspatial import patch_analysis as pa
+
+    def old_circle(patch, formula):
+        hull = ConvexHull(patch)
+        edge = list(np.array(patch)[hull.vertices])
+        max_dist = 0.0
+        for i, cell1 in enumerate(edge):
+            for cell2 in edge[i+1:]:
+                squared_dist = utils.squared_toroidal_dist(cell1, cell2,
+                                                           world_size)
+                if squared_dist > max_dist:
+                    max_dist = squared_dist
+                    cell_pair = (cell1, cell2)
+        radius = sqrt(max_dist)/2.0
+        if formula:
+            return 1-(len(patch)/((radius**2)*pi))
+        center = ((cell_pair[0][0]+cell_pair[1][0])/2.0,
+                  (cell_pair[0][1]+cell_pair[1][1])/2.0)
+        circle_area = 0.0
+        for x in range(int(floor(center[0]-radius)),
+                       int(ceil(center[0]+radius)+1)):
+            for y in range(int(floor(center[1]-radius)),
+                           int(ceil(center[1]+radius)+1)):
+                if utils.dist((x, y), center) <= radius:
+                    circle_area += 1
+        return 1 - (len(patch)/circle_area)
+
+    center = (world_size[0] // 2, world_size[1] // 2)
+    patch = [[x, y] for x in range(world_size[0])
+             for y in range(world_size[1])
+             if utils.dist((x, y), center) <= radius]
+
+    cases = [("old formula", lambda: old_circle(patch, True)),
+             ("formula", lambda: pa.related_circumscribing_circle(
+                 patch, True, world_size)),
+             ("old count", lambda: old_circle(patch, False)),
+             ("count", lambda: pa.related_circumscribing_circle(
+                 patch, False, world_size))]
+
+    print("Related circumscribing circle of a %d cell patch" % len(patch))
+    for name, func in cases:
+        print("  %-16s %.3f s" % (name, best_time(func, 3)))
+
+
+BENCHMARKS = {"first_file_reads": bench_first_file_reads,
+              "mode_median": bench_mode_median,
+              "string_avg": bench_string_avg,
+              "gradient_parsing": bench_gradient_parsing,
+              "environment_batch": bench_environment_batch,
+              "environment_entropy": bench_environment_entropy,
+              "diversity_map": bench_diversity_map,
+              "spatial_weights": bench_spatial_weights,
+              "diversity_cube": bench_diversity_cube,
+              "patch_metrics": bench_patch_metrics,
+              "label_patches": bench_label_patches,
+              "patch_metrics_table": bench_patch_metrics_table,
+              "core_areas": bench_core_areas,
+              "circumscribing_circle": bench_circumscribing_circle}
+
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or sorted(BENCHMARKS)
+    for name in names:
+        BENCHMARKS[name]()
@@ -0,0 +1,85 @@
+from avidaspatial import *
+import os
+import shutil
+import glob
+
+
+def test_load_grid_data_cached(tmpdir):
+    cache_dir = str(tmpdir.join("cache"))
+    data_files = glob.glob("tests/grid_task.*.dat")
+    expected = load_grid_data(list(data_files), as_array=True)
+
+    data = load_grid_data(list(data_files), as_array=True,
+                          cache_dir=cache_dir)
+    assert((data == expected).all())
+    assert(len(os.listdir(cache_dir)) == len(data_files))
+
+    cached = load_cached_grid(data_files[0], cache_dir)
+    assert(isinstance(cached, np.memmap))
+    data = load_grid_data(list(data_files), as_array=True,
+                          cache_dir=cache_dir)
+    assert((data == expected).all())
+    assert(load_grid_data(list(data_files), cache_dir=cache_dir) ==
+           load_grid_data(list(data_files)))
+
+
+def test_get_world_dimensions_cached(tmpdir):
+    cache_dir = str(tmpdir)
+    parse_grid_file("tests/grid_task.100000.dat", cache_dir=cache_dir)
+    assert(get_world_dimensions("tests/grid_task.100000.dat",
+                                cache_dir=cache_dir) == (11, 5))
+
+
+def test_cache_invalidated_by_changes(tmpdir):
+    grid_file = str(tmpdir.join("grid_task.1.dat"))
+    cache_dir = str(tmpdir.join("cache"))
+    shutil.copy("tests/grid_task.100000.dat", grid_file)
+    parse_grid_file(grid_file, cache_dir=cache_dir)
+    assert(load_cached_grid(grid_file, cache_dir) is not None)
+
+    shutil.copy("tests/grid_task.200000.dat", grid_file)
+    os.utime(grid_file, (0, 0))
+    assert(load_cached_grid(grid_file, cache_dir) is None)
+    grid = parse_grid_file(grid_file, cache_dir=cache_dir)
+    assert((grid == parse_grid_file("tests/grid_task.200000.dat")).all())
+
+
+def test_cache_eviction(tmpdir):
+    cache_dir = str(tmpdir)
+    data_files = sorted(glob.glob("tests/grid_task.*.dat"))
+    first_entry = store_cached_grid(data_files[0],
+                                    parse_grid_file(data_files[0]), cache_dir)
+    entry_size = os.path.getsize(first_entry)
+    os.utime(first_entry, (0, 0))
+
+    for i, f in enumerate(data_files[1:4]):
+        parse_grid_file(f, cache_dir=cache_dir,
+                        max_cache_bytes=2 * entry_size)
+        os.utime(cached_grid_path(f, cache_dir), (i + 1, i + 1))
+    assert(len(os.listdir(cache_dir)) == 2)
+    assert(load_cached_grid(data_files[0], cache_dir) is None)
+    assert(load_cached_grid(data_files[1], cache_dir) is None)
+    assert(load_cached_grid(data_files[3], cache_dir) is not None)
+
+    clear_grid_cache(cache_dir)
+    assert(os.listdir(cache_dir) == [])
+
+
+def test_load_grid_data_trims_cache_once(tmpdir):
+    cache_dir = str(tmpdir)
+    data_files = sorted(glob.glob("tests/grid_task.*.dat"))
+    entry = store_cached_grid(data_files[0], parse_grid_file(data_files[0]),
+                              cache_dir, max_bytes=None)
+    entry_size = os.path.getsize(entry)
+
+    # Storing without a limit doesn't evict anything
+    for f in data_files[1:3]:
+        parse_grid_file(f, cache_dir=cache_dir, max_cache_bytes=None)
+    assert(len(os.listdir(cache_dir)) == 3)
+
+    load_grid_data(list(data_files[:3]), as_array=True, cache_dir=cache_dir,
+                   max_cache_bytes=2 * entry_size)
+    assert(len(os.listdir(cache_dir)) <= 2)
+    list(iter_grid_data(list(data_files[:3]), cache_dir=cache_dir,
+                        max_cache_bytes=entry_size))
+    assert(len(os.listdir(cache_dir)) <= 1)
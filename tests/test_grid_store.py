@@ -0,0 +1,48 @@
+from avidaspatial import *
+import os
+import shutil
+import glob
+
+
+def make_experiment(root):
+    data_files = sorted(glob.glob("tests/grid_task.*.dat"))
+    for i in range(2):
+        os.makedirs(os.path.join(root, "run" + str(i)))
+        for f in data_files[:4 - i]:
+            shutil.copy(f, os.path.join(root, "run" + str(i)))
+    return data_files
+
+
+def test_build_grid_store(tmpdir):
+    root = str(tmpdir.join("experiment"))
+    store = str(tmpdir.join("store"))
+    data_files = make_experiment(root)
+    metadata = build_grid_store(root, store)
+
+    assert(metadata == grid_store_metadata(store))
+    assert(metadata["replicates"] == ["run0", "run1"])
+    assert(len(metadata["times"]) == 4)
+    assert(metadata["world_size"] == [11, 5])
+    assert(metadata["missing"] == [[1, 3]])
+
+    expected = load_grid_data(data_files[:4], as_array=True)
+    data = load_grid_store(store, "run0", time_last=True)
+    assert(isinstance(data, np.memmap))
+    assert(data.shape == expected.shape)
+    assert((data == expected).all())
+    assert((load_grid_store(store)[1, 3] == -1).all())
+
+
+def test_load_grid_store(tmpdir):
+    root = str(tmpdir.join("experiment"))
+    store = str(tmpdir.join("store"))
+    make_experiment(root)
+    metadata = build_grid_store(root, store, "int")
+    times = metadata["times"]
+
+    data = open_grid_store(store)
+    assert(data.shape == (2, 4, 5, 11))
+    assert((load_grid_store(store, times=times[2]) == data[:, 2]).all())
+    assert((load_grid_store(store, 1, times[:2]) == data[1, :2]).all())
+    assert((load_grid_store(store, ["run1", "run0"], [times[3]]) ==
+            data[[1, 0]][:, [3]]).all())
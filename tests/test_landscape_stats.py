@@ -29,3 +29,32 @@ def test_patch_richness():
 def test_calc_environment_entropy():
     env = parse_environment_file("tests/example_environment.cfg")
     assert(np.isclose(calc_environment_entropy(env, (11, 5)), 1.1983414))
+
+
+def test_make_niche_dictionary():
+    env = parse_environment_file("tests/example_environment.cfg", (4, 6))
+    summary = parse_environment_batch("tests/example_environment.cfg",
+                                      (4, 6))
+    summary = summary["tests/example_environment.cfg"]
+    grid = env.grid
+    for world in [env, grid, summary]:
+        niches = make_niche_dictionary(world, (4, 2))
+        assert(list(niches.items()) ==
+               [(frozenset(["test", "nor"]), 5), (frozenset(["nor"]), 2),
+                (frozenset([]), 1)])
+        cells = make_niche_dictionary(world, (4, 2), "cells")
+        assert(cells[frozenset(["nor"])] == [[1, 1], [1, 2]])
+        assert(patch_richness(world, (4, 6)) == 4)
+
+
+def test_entropy_array():
+    d = {"a": 3, "b": 6, "c": 1, "d": 2, "e": 1}
+    assert(np.isclose(entropy_array([3, 6, 1, 2, 1]), entropy(d)))
+    assert(np.isclose(entropy([3, 6, 1, 2, 1]), entropy(d)))
+    counts = np.array([[2, 2, 0], [16, 9, 0], [0, 0, 0]])
+    result = entropy_array(counts)
+    assert(np.allclose(result, [1, entropy({"a": 16, "b": 9}), 0]))
+    result = entropy_array(counts, "sqrt_shannon")
+    assert(np.allclose(result, [1, entropy({"a": 4, "b": 3}), 0]))
+    result = entropy_array(counts, "simpson")
+    assert(np.allclose(result, [.5, (16**2 + 9**2) / 25.0**2, 0]))
@@ -1,4 +1,5 @@
 from avidaspatial import *
+import glob
 
 
 def test_parse_environment_file_list():
@@ -14,6 +15,23 @@ def test_parse_environment_file_list():
                                        ]])
 
 
+def test_environment_masks():
+    env = parse_environment_file("tests/example_environment.cfg", (4, 6))
+    assert(env.masks.shape == (len(env.resources), 6, 4))
+    nor = env.masks[env.resources.index("nor")]
+    assert(nor.tolist() == [["nor" in cell for cell in row]
+                            for row in env.grid])
+    assert(set(env.niches) == set(frozenset(cell) for row in env.grid
+                                  for cell in row))
+    for i in range(6):
+        for j in range(4):
+            assert(env.niches[env.niche_ids[i][j]] == env[i][j])
+
+    env.grid = [[set(["nor"]), set()]]
+    assert(env.masks[env.resources.index("nor")].tolist() == [[True, False]])
+    assert(len(env.niches) == 2)
+
+
 def test_load_grid_data():
     data_file = "tests/grid_task.200000.dat"
     data = load_grid_data(data_file)
@@ -81,3 +99,118 @@ def test_agg_grid():
 
     agg = agg_grid(example_grid, mean)
     assert(agg == result)
+
+
+def test_load_grid_data_as_array():
+    data_files = ["tests/grid_task.300000.dat", "tests/grid_task.200000.dat"]
+    expected = load_grid_data(list(data_files))
+    data = load_grid_data(data_files, as_array=True)
+    assert(data.shape == (5, 11, 2))
+    assert(data[0, 0, 0] == 12)
+    assert([[[bin(val) for val in cell] for cell in row]
+            for row in data.tolist()] == expected)
+
+
+def test_load_grid_data_as_array_int():
+    data_file = "tests/grid_task.200000.dat"
+    data = load_grid_data(data_file, "int", as_array=True)
+    assert(data.tolist() == load_grid_data(data_file, "int"))
+    data = load_grid_data(data_file, "float", as_array=True)
+    assert(data.dtype == np.float64)
+    assert(data.tolist() == load_grid_data(data_file, "float"))
+
+
+def test_parse_grid_file():
+    grid = parse_grid_file("tests/grid_task.8000000.dat")
+    assert(grid.shape == (5, 11))
+    assert(grid.min() == -1)
+    grid = parse_grid_file("tests/grid_task.8000000.dat", "string")
+    assert(grid[0, 0] == load_grid_data("tests/grid_task.8000000.dat",
+                                        "string")[0][0][0])
+
+
+def test_parse_grid_file_malformed(tmpdir):
+    for data_type, text in [("binary", "1 2 3\nx 5 6\n"),
+                            ("int", "1 2 3\n4 9.5 6\n"),
+                            ("float", "1 2 3\n4 5\n")]:
+        grid_file = str(tmpdir.join("grid_task." + data_type + ".dat"))
+        with open(grid_file, "w") as outfile:
+            outfile.write(text)
+        try:
+            load_grid_data(grid_file, data_type, as_array=True)
+            assert(False)
+        except ValueError:
+            pass
+
+
+def test_load_grid_data_workers():
+    data_files = glob.glob("tests/grid_task.*.dat")
+    expected = load_grid_data(list(data_files))
+    assert(load_grid_data(list(data_files), workers=2) == expected)
+    data = load_grid_data(list(data_files), as_array=True, workers=3)
+    assert((data == load_grid_data(data_files, as_array=True)).all())
+
+
+def test_iter_grid_data():
+    data_files = glob.glob("tests/grid_task.*.dat")
+    data = load_grid_data(list(data_files))
+    snapshots = list(iter_grid_data(data_files))
+    assert(len(snapshots) == len(data_files))
+    for k, snapshot in enumerate(snapshots):
+        assert(snapshot == slice_3d_grid(data, k))
+    arrays = list(iter_grid_data(data_files, as_array=True))
+    assert((np.dstack(arrays) == load_grid_data(data_files,
+                                                as_array=True)).all())
+
+
+def test_load_grid_data_world_size():
+    data_file = "tests/grid_task.200000.dat"
+    expected = load_grid_data(data_file)
+    assert(load_grid_data(data_file, world_size=(11, 5)) == expected)
+    data = load_grid_data(data_file, as_array=True, world_size=(11, 5))
+    assert(data.shape == (5, 11, 1))
+    try:
+        load_grid_data(data_file, as_array=True, world_size=(5, 11))
+        assert(False)
+    except ValueError:
+        pass
+
+
+def test_parse_gradient():
+    line = "GRADIENT_RESOURCE resNOR0:height=2:peakx=0:peaky=1"
+    name, cells = parse_gradient(line, (4, 4))
+    assert(name == "nor")
+    assert(cells == [(0, 0), (0, 1), (0, 2), (1, 1)])
+    name, cells = parse_gradient(line, (4, 4), toroidal=True)
+    assert(cells == [(0, 0), (0, 1), (0, 2), (1, 1), (3, 1)])
+    env = parse_environment_file("tests/example_environment.cfg", (4, 6),
+                                 toroidal=True)
+    assert("nor" in env[5][3])
+
+
+def test_parse_cell_ranges():
+    line = "CELL resTEST32:10..13,15..16,21,22,23:initial=1"
+    name, ranges = parse_cell_ranges(line)
+    assert(name == "test")
+    assert(ranges == [(10, 14), (15, 17), (21, 24)])
+    name, cells = parse_cell(line, (4, 6))
+    assert(cells == [(c % 4, c // 4) for c in [10, 11, 12, 13, 15, 16, 21,
+                                               22, 23]])
+    masks = make_niche_masks({}, ["test"], (4, 6), {"test": ranges})
+    assert(np.flatnonzero(masks[0]).tolist() == [10, 11, 12, 13, 15, 16,
+                                                 21, 22, 23])
+
+
+def test_parse_environment_batch():
+    names = ["tests/example_environment.cfg",
+             "tests/example_environment2.cfg"]
+    index = parse_environment_batch(names, (4, 6))
+    index_pool = parse_environment_batch(names, (4, 6), workers=2)
+    for name in names:
+        env = parse_environment_file(name, (4, 6))
+        summary = index[name]
+        assert(summary.resources == env.resources)
+        assert(summary.tasks == env.tasks)
+        assert([[summary.niches[i] for i in row] for row in
+                summary.niche_ids.tolist()] == env.grid)
+        assert(np.array_equal(index_pool[name].niche_ids, summary.niche_ids))
@@ -1,5 +1,6 @@
 from avidaspatial import *
 import numpy as np
+from math import pi
 
 
 def test_area():
@@ -147,6 +148,25 @@ def test_related_circumscribing_circle():
     assert(np.isclose(related_circumscribing_circle(patch), 0.083267))
     assert(np.isclose(related_circumscribing_circle(patch, False), 0.18181818))
 
+    # Patches crossing the edge of the world are measured across it
+    wrapped = [[58, 3], [59, 3], [0, 3], [1, 3], [59, 4], [0, 4], [0, 2]]
+    moved = [[(x + 10) % 60, y] for x, y in wrapped]
+    for formula in [True, False]:
+        assert(np.isclose(related_circumscribing_circle(wrapped, formula),
+                          related_circumscribing_circle(moved, formula)))
+    assert(related_circumscribing_circle([[3, 3]]) == 0)
+
+    # A patch wider than half the world that doesn't cross an edge is
+    # measured across its full width
+    wide = [[x, y] for x in range(40) for y in range(3)]
+    expected = 1 - len(wide) / (pi * (39 ** 2 + 2 ** 2) / 4.0)
+    assert(np.isclose(related_circumscribing_circle(wide), expected))
+    # 1208 cells are within the circle
+    assert(np.isclose(related_circumscribing_circle(wide, False),
+                      1 - len(wide) / 1208.0))
+    assert(np.isclose(related_circumscribing_circle([[0, 0], [0, 1], [0, 2]],
+                                                    False), 0.4))
+
 
 def test_contiguity_index():
     assert(contiguity_index([]) == 0)
@@ -198,3 +218,103 @@ def test_core_area_index():
              [2, 0], [2, 1], [2, 2], [2, 3]]
     expected = 1.0/6.0
     assert(np.isclose(core_area_index(patch, 1), expected))
+
+
+def test_neighbor_table():
+    world_size = (7, 5)
+    for neighbor_func in [get_moore_neighbors_toroidal, get_moore_neighbors,
+                          get_rook_neighbors_toroidal, get_rook_neighbors,
+                          get_25_neighbors]:
+        neighborhood, radius, toroidal = NEIGHBORHOODS[neighbor_func]
+        table = neighbor_table(world_size, neighborhood, radius, toroidal)
+        for x, y in [(0, 0), (3, 2), (6, 4)]:
+            row = table[y * world_size[0] + x]
+            neighbors = [[n % world_size[0], n // world_size[0]]
+                         for n in row if n >= 0]
+            assert(neighbors == neighbor_func([x, y], world_size))
+
+
+def test_label_patches():
+    world = [[1, 1, 0, 1],
+             [0, 0, 0, 1],
+             [2, -1, -1, 2]]
+    labels, patches = label_patches(world, background=-1)
+    assert(labels.tolist() == [[0, 0, 1, 0],
+                               [1, 1, 1, 0],
+                               [2, -1, -1, 2]])
+    assert([list(patch) for patch in patches] ==
+           [[0, 1, 3, 7], [2, 4, 5, 6], [8, 11]])
+
+    labels, patches = label_patches(world, "rook", toroidal=False)
+    assert(labels.max() == 5)
+    assert(list(patches[2]) == [3, 7])
+    assert(label_patches([[-1, -1]], background=-1)[1] == [])
+
+    # Agrees with traversing each value's cells separately
+    world = np.random.RandomState(0).randint(3, size=(12, 10))
+    labels, patches = label_patches(world)
+    expected = []
+    for value in range(3):
+        cells = [[x, y] for y in range(12) for x in range(10)
+                 if world[y][x] == value]
+        expected += [sorted(y * 10 + x for x, y in core) for core in
+                     traverse_core(cells, (10, 12))]
+    assert(sorted(expected) == sorted(list(patch) for patch in patches))
+
+
+def test_patch_metrics():
+    world = np.random.RandomState(1).randint(-1, 3, size=(9, 12))
+    labels, patches = label_patches(world, background=-1)
+    table = patch_metrics(labels)
+    assert(list(table["label"]) == list(range(len(patches))))
+
+    for label, patch in enumerate(patches):
+        cells = [[int(cell % 12), int(cell // 12)] for cell in patch]
+        perim = perimeter(cells, (12, 9))
+        expected = {"area": area(cells),
+                    "perimeter": perim,
+                    "shape_index": shape_index(cells, perim),
+                    "fractal_dimension": fractal_dimension(cells, perim),
+                    "contiguity_index": contiguity_index(cells),
+                    "radius_of_gyration": radius_of_gyration(cells),
+                    "related_circumscribing_circle":
+                        related_circumscribing_circle(cells,
+                                                      world_size=(12, 9))}
+        for metric in expected:
+            assert(np.isclose(table[metric][label], expected[metric]))
+
+
+def test_core_area():
+    world_size = (20, 12)
+    patch = [[x, y] for x in range(world_size[0]) for y in range(world_size[1])
+             if dist((x, y), (2, 6)) <= 5]
+    edge = get_edge_locations(patch, world_size)
+    for distance in [0, 1, np.sqrt(2), 2, 3]:
+        expected = [cell for cell in patch
+                    if min([toroidal_dist(cell, other, world_size)
+                            for other in edge]) >= distance]
+        assert(core_area(patch, distance, world_size) == len(expected))
+        cores = get_core_areas(patch, distance, world_size)
+        assert(sorted(cell for core in cores for cell in core) ==
+               sorted(tuple(cell) for cell in expected))
+        assert(number_core_areas(patch, distance, world_size) == len(cores))
+
+
+def test_toroidal_centroid():
+    patch = [[0, 0], [0, 1], [0, 2], [1, 1]]
+    assert(np.allclose(toroidal_centroid(patch), centroid(patch)))
+    assert(np.isclose(toroidal_radius_of_gyration(patch),
+                      radius_of_gyration(patch)))
+
+    # Crossing the edge of the world
+    wrapped = [[59, 5], [0, 5], [1, 5], [58, 5]]
+    assert(np.allclose(toroidal_centroid(wrapped), (59.5, 5)))
+    assert(np.isclose(toroidal_radius_of_gyration(wrapped), 1))
+    assert(toroidal_centroid([]) == (0, 0))
+
+    labels = [0, 0, 0, 0, 1, 1, 1, 1]
+    assert(np.allclose(toroidal_centroid(patch + wrapped, labels=labels),
+                       [centroid(patch), (59.5, 5)]))
+    assert(np.allclose(toroidal_radius_of_gyration(patch + wrapped,
+                                                   labels=labels),
+                       [radius_of_gyration(patch), 1]))
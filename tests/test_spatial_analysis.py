@@ -1,5 +1,6 @@
 from avidaspatial import *
 import numpy as np
+import pysal
 
 
 expected = [[1.4466166676282082, 0.9864267287308424, 0.9864267287308424,
@@ -41,6 +42,59 @@ def test_diversity_map():
             assert(np.isclose(num, expected[i][j]))
 
 
+def test_diversity_raster():
+    world = load_grid_data("tests/grid_task.10000.dat")
+    world = agg_grid(world, mode)
+
+    data = diversity_raster(world)
+    assert(np.allclose(data, expected))
+    for neighbor_func in [get_rook_neighbors_toroidal, get_25_neighbors]:
+        neighborhood, radius, toroidal = NEIGHBORHOODS[neighbor_func]
+        counts = neighborhood_counts(world, neighborhood, radius, toroidal)[0]
+        assert(counts[0][0].sum() == len(neighbor_func([0, 0], (11, 5))) + 1)
+        # Wrapping the neighbor function forces the per-cell calculation
+        per_cell = diversity_map(world, lambda cell, size:
+                                 neighbor_func(cell, size))
+        assert(np.allclose(diversity_raster(world, neighborhood, radius,
+                                            toroidal), per_cell))
+
+
+def test_weighted_neighborhood_counts():
+    world = load_grid_data("tests/grid_task.10000.dat")
+    world = agg_grid(world, mode)
+
+    w = make_toroidal_weights(len(world), len(world[0]), rook=False)
+    matrix = spatial_weights_matrix(w, len(world) * len(world[0]))
+    assert(np.allclose(matrix.sum(axis=1), 9))
+    assert(np.allclose(diversity_raster(world, weights=matrix), expected))
+
+    # Repeated neighbors and uneven weights are added up
+    neighbors = {0: [1, 1, 2], 1: [0], 2: []}
+    weights = {0: [0.5, 0.25, 2], 1: [3], 2: []}
+    w = pysal.weights.W(neighbors, weights)
+    counts, values = weighted_neighborhood_counts([["a", "b", "a"]], w)
+    assert(list(values) == ["a", "b"])
+    assert(np.allclose(counts, [[[3, 0.75], [3, 1], [1, 0]]]))
+
+
+def test_diversity_cube():
+    data = load_grid_data(["tests/grid_task.10000.dat",
+                           "tests/grid_task.20000.dat",
+                           "tests/grid_task.100000.dat"])
+
+    cube = diversity_cube(data)
+    assert(cube.shape == (len(data), len(data[0]), len(data[0][0])))
+    w = make_toroidal_weights(len(data), len(data[0]), rook=False)
+    for t in range(len(data[0][0])):
+        world = slice_3d_grid(data, t)
+        assert(np.allclose(cube[:, :, t], diversity_map(world)))
+        assert(np.allclose(diversity_cube(data, weights=w)[:, :, t],
+                           diversity_map_spatial_weights(world, w)))
+
+    assert(np.allclose(diversity_cube(data, "rook", workers=2),
+                       diversity_cube(data, "rook")))
+
+
 if __name__ == "__main__":
     test_diversity_map()
     test_diversity_map_spatial_weights()
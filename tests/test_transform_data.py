@@ -0,0 +1,27 @@
+from avidaspatial import *
+import glob
+
+
+def test_stream_task_percentages():
+    data_files = glob.glob("tests/grid_task.*.dat")
+    expected = task_percentages(load_grid_data(list(data_files)))
+    result = stream_task_percentages(iter_grid_data(data_files))
+    assert(np.allclose(result, expected))
+    result = stream_task_percentages(iter_grid_data(data_files,
+                                                    as_array=True))
+    assert(np.allclose(result, expected))
+
+
+def test_task_percentages_array():
+    data_files = glob.glob("tests/grid_task.*.dat")
+    expected = task_percentages(load_grid_data(list(data_files)))
+    result = task_percentages(load_grid_data(list(data_files),
+                                             as_array=True))
+    assert(np.allclose(result, expected))
+
+
+def test_make_count_grid_array():
+    data = load_grid_data("tests/grid_task.100000.dat")
+    expected = make_count_grid(data)
+    result = make_count_grid(pack_phenotypes(data))
+    assert(result.tolist() == expected)
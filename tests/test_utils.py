@@ -1,9 +1,11 @@
 from avidaspatial import *
+import glob
 
 
 def test_mode():
     assert(mode([1, 1, 1, 2, 3]) == 1)
     assert(mode([5, 10, 3, 2, 5, 1, 11]) == 5)
+    assert(mode([3, -1, 3, -1, 2]) == -1)
 
 
 def test_mean():
@@ -15,11 +17,26 @@ def test_mean():
 
 def test_median():
     assert(median([1, 5, 3]) == 3)
+    assert(median([4, 1, 3, 2]) == 3)
+    values = list(range(2000, 0, -1))
+    assert(median(values) == sorted(values)[1000])
+
+
+def test_mode_median_array():
+    values = np.random.RandomState(0).randint(-1, 20, size=(4, 3, 11))
+    assert(mode_array(values).tolist() ==
+           [[mode(list(cell)) for cell in row] for row in values])
+    assert(median_array(values).tolist() ==
+           [[median(list(cell)) for cell in row] for row in values])
+    assert(mode_array([[[1e9, 2.5, 2.5]]]).tolist() == [[2.5]])
 
 
 def test_string_avg():
     strings = ["0b0", "0b10", "0b011"]
     assert(string_avg(strings) == "0b010")
+    # Binary strings without a prefix are averaged digit by digit
+    assert(string_avg(["101", "111", "001"]) == "101")
+    assert(agg_grid([[["101", "111", "001"]]], string_avg) == [["101"]])
 
 
 def test_convert_to_pysal():
@@ -32,3 +49,103 @@ def test_convert_to_pysal():
 def test_get_world_dimensions():
     dims = get_world_dimensions("tests/grid_task.100000.dat")
     assert(dims == (11, 5))
+
+
+def test_stream_mode():
+    data_files = glob.glob("tests/grid_task.*.dat")
+    expected = agg_grid(load_grid_data(list(data_files), "int"), mode)
+    assert(stream_mode(iter_grid_data(data_files, "int")) == expected)
+    result = stream_mode(iter_grid_data(data_files, "int", as_array=True))
+    assert(result.tolist() == expected)
+    assert(stream_mode([[[1, 2]], [[2, 1]]]) == [[1, 1]])
+
+
+def test_stream_mean():
+    data_files = glob.glob("tests/grid_task.*.dat")
+    expected = agg_grid(load_grid_data(list(data_files), "int"), mean)
+    assert(stream_mean(iter_grid_data(data_files, "int")) == expected)
+
+
+def test_stream_string_avg():
+    data_files = glob.glob("tests/grid_task.*.dat")
+    expected = agg_grid(load_grid_data(list(data_files)), string_avg)
+    assert(stream_string_avg(iter_grid_data(data_files)) == expected)
+    result = stream_string_avg(iter_grid_data(data_files, as_array=True))
+    assert(result.tolist() == [[int(val, 2) for val in row]
+                               for row in expected])
+    assert(stream_string_avg([[["0b0"]], [["0b10"]], [["0b011"]]]) ==
+           [["0b010"]])
+
+
+def test_popcount():
+    assert(popcount(11) == 3)
+    assert(popcount(-1) == 1)
+    values = np.array([[0, 5, -1], [511, 256, 3]], dtype=np.int16)
+    assert(popcount(values).tolist() == [[0, 2, 1], [9, 1, 2]])
+
+
+def test_bit_length():
+    values = np.array([0, 1, 5, -1, 256])
+    assert(bit_length(values).tolist() == [0, 1, 3, 1, 9])
+
+
+def test_bit_is_set():
+    values = np.array([0, 5, -1, 4])
+    assert(bit_is_set(values, 2).tolist() == [False, True, False, True])
+    assert(bit_is_set(values, 0).tolist() == [False, True, False, False])
+
+
+def test_pack_phenotypes():
+    data = load_grid_data("tests/grid_task.100000.dat")
+    packed = pack_phenotypes(data)
+    assert(packed.dtype == np.int8)
+    assert(unpack_phenotypes(packed) == data)
+    assert(np.array_equal(packed[:, :, 0],
+                          load_grid_data("tests/grid_task.100000.dat",
+                                         as_array=True)[:, :, 0]))
+
+
+def test_phenotype_ints():
+    resources = ["a", "b", "c"]
+    assert(phenotype_to_res_set(6, resources) ==
+           phenotype_to_res_set("0b110", resources))
+    assert(res_set_to_phenotype(set(["a", "b"]), resources, True) == 6)
+    assert(n_tasks(6) == 2)
+    assert(string_avg([0, 2, 3]) == 2)
+
+
+def test_agg_grid_array():
+    data_files = glob.glob("tests/grid_task.*.dat")
+    data = load_grid_data(list(data_files), "int")
+    array = load_grid_data(list(data_files), "int", as_array=True)
+    for agg in [mode, mean, median]:
+        result = agg_grid(array, agg)
+        assert(isinstance(result, np.ndarray))
+        assert(result.tolist() == agg_grid(data, agg))
+    assert(agg_grid(array, max).tolist() == agg_grid(data, max))
+    assert(agg_grid([[[2, 1, 2, 1]]], mode) == [[1]])
+    assert(agg_grid([[["ab", "ab", "cd"]]], string_avg) == [["ab"]])
+    try:
+        agg_grid(array)
+        assert(False)
+    except ValueError:
+        pass
+
+
+def test_bitwise_majority():
+    assert(bitwise_majority(["0b0", "0b10", "0b011"]) == "0b010")
+    assert(bitwise_majority([0, 2, 3]) == 2)
+    assert(bitwise_majority(["-0b1", "-0b1", "0b101"]) == "-0b1")
+    grid = [[["0b1", "0b11", "0b10"], ["0b0", "-0b1", "0b1"]]]
+    assert(bitwise_majority(grid).tolist() == [["0b11", "0b01"]])
+    assert(bitwise_majority(grid).tolist() ==
+           [[string_avg(cell) for cell in row] for row in grid])
+    packed = pack_phenotypes(grid)
+    assert(bitwise_majority(packed).tolist() == [[3, 1]])
+
+
+def test_map_in_pool():
+    items = list(range(10))
+    assert(list(map_in_pool(abs, items)) == items)
+    assert(list(map_in_pool(str, items, workers=2)) ==
+           [str(i) for i in items])
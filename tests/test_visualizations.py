@@ -170,6 +170,53 @@ def test_diversity_heat_map():
              palette=pal, denom=denom)
     return fig
 
+def test_make_movie_array():
+    phenotypes = load_grid_data(["tests/grid_task.10000.dat",
+                                 "tests/grid_task.20000.dat",
+                                 "tests/grid_task.100000.dat"],
+                                as_array=True)
+
+    # Just check which frames would be drawn, without saving the movie
+    save = matplotlib.animation.FuncAnimation.save
+    matplotlib.animation.FuncAnimation.save = lambda *args, **kwargs: None
+    try:
+        anim = make_movie(phenotypes)
+    finally:
+        matplotlib.animation.FuncAnimation.save = save
+    plt.close("all")
+
+    assert(list(anim.new_frame_seq()) == [0, 1, 2])
+
+
+def test_make_movie_iterator():
+    data_files = ["tests/grid_task.10000.dat", "tests/grid_task.20000.dat",
+                  "tests/grid_task.100000.dat"]
+    snapshots = list(iter_grid_data(data_files))
+
+    # Draw every frame the way saving would, and record what gets colored
+    rendered = []
+    color = visualizations.color_grid
+
+    def record(phen_grid, *args, **kwargs):
+        rendered.append(phen_grid)
+        return color(phen_grid, *args, **kwargs)
+
+    def draw_frames(anim, *args, **kwargs):
+        for frame in anim.new_frame_seq():
+            anim._draw_frame(frame)
+
+    save = matplotlib.animation.FuncAnimation.save
+    matplotlib.animation.FuncAnimation.save = draw_frames
+    visualizations.color_grid = record
+    try:
+        make_movie(iter_grid_data(data_files), n_frames=len(data_files))
+    finally:
+        matplotlib.animation.FuncAnimation.save = save
+        visualizations.color_grid = color
+    plt.close("all")
+
+    assert(rendered == snapshots)
+
 # def test_make_movie():
 #     fig = plt.figure()
 #     print(glob.glob("tests/positivegrid_task.*.dat"))